@@ -0,0 +1,700 @@
+# File for reproducible performance benchmarks
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import fred_loader
+from fred_config import INDICATORS, PLOT_POINT_BUDGET, REGIMES
+from fred_stats import compute_regime_stats
+from fred_transformer import (
+    classify_periods,
+    create_forward_metrics,
+    fill_missing_values,
+    fred_transform,
+)
+from fred_writer import fred_save
+
+# pandas date_range aliases for each native frequency
+PANDAS_FREQ = {'D': 'D', 'M': 'MS', 'Q': 'QS'}
+
+
+def make_series(series_id, frequency='D', start='1976-01-01', end='2024-12-31',
+                rows=None, missing_rate=0.01):
+    """
+    Generate a synthetic FRED-shaped series as date and value strings
+
+    Values are a seeded random walk so every run (and every machine) sees
+    the same data. A share of values is replaced with FRED's '.' marker.
+
+    Args:
+        series_id: Seeds the generator
+        frequency: 'D', 'M' or 'Q'
+        start, end: Date span; ignored for the end when rows is given
+        rows: Exact number of observations instead of an end date
+        missing_rate: Share of observations reported as '.'
+
+    Returns:
+        (dates, values) as NumPy string arrays
+    """
+    rng = np.random.default_rng(zlib.crc32(series_id.encode()))
+    if rows is None:
+        dates = pd.date_range(start, end, freq=PANDAS_FREQ[frequency])
+        dates = dates.strftime('%Y-%m-%d')
+    elif frequency == 'D':
+        # Day arithmetic in NumPy so long payloads are not bound by pandas'
+        # nanosecond range
+        dates = np.datetime_as_string(np.datetime64(start, 'D') + np.arange(rows))
+    else:
+        dates = pd.date_range(start, periods=rows, freq=PANDAS_FREQ[frequency])
+        dates = dates.strftime('%Y-%m-%d')
+
+    walk = 3 + np.cumsum(rng.normal(0, 0.05, len(dates)))
+    values = np.char.mod('%.2f', walk)
+    values[rng.random(len(dates)) < missing_rate] = '.'
+    return np.asarray(dates), values
+
+def make_payload(dates, values, realtime='2024-12-31', starts=None, ends=None,
+                 count=None, offset=0):
+    """
+    Encode observations exactly the way the FRED API returns them
+
+    starts and ends give each row its own real-time period, as in a
+    vintage (realtime_start/realtime_end) request.
+    """
+    starts = [realtime] * len(dates) if starts is None else starts.tolist()
+    ends = [realtime] * len(dates) if ends is None else ends.tolist()
+    observations = [
+        {'realtime_start': start, 'realtime_end': end, 'date': date, 'value': value}
+        for date, value, start, end in zip(dates.tolist(), values.tolist(),
+                                           starts, ends)
+    ]
+    return json.dumps({
+        'realtime_start': realtime,
+        'realtime_end': realtime,
+        'observation_start': dates[0] if len(dates) else None,
+        'count': len(observations) if count is None else count,
+        'offset': offset,
+        'limit': 100000,
+        'observations': observations,
+    }).encode()
+
+def make_vintages(series_id, start='1990-01-01', end='2024-12-31',
+                  revisions=(30, 60, 395)):
+    """
+    Synthetic revision history for a monthly series
+
+    Each observation is first published revisions[0] days after its date
+    and revised at each later offset, with revisions shrinking toward the
+    final value.
+
+    Returns:
+        (dates, values, realtime_start, realtime_end) string arrays, one
+        row per version
+    """
+    dates, values = make_series(series_id, 'M', start, end)
+    rng = np.random.default_rng(zlib.crc32(series_id.encode()))
+    days = dates.astype('datetime64[D]')
+    offsets = np.asarray(revisions)
+    starts = days[:, None] + offsets[None, :]
+    open_ended = np.full((len(days), 1), np.datetime64('9999-12-31'))
+    ends = np.concatenate([starts[:, 1:] - 1, open_ended], axis=1)
+    noise = rng.normal(0, 0.2, (len(days), len(offsets)))
+    noise /= (1 + np.arange(len(offsets)))[None, :]
+    noise[:, -1] = 0
+    missing = values == '.'
+    numeric = np.where(missing, '0', values).astype('float64')
+    versions = np.char.mod('%.2f', numeric[:, None] + noise)
+    versions[missing] = '.'
+    return (np.repeat(dates, len(offsets)), versions.ravel(),
+            starts.ravel().astype(str), ends.ravel().astype(str))
+
+class StubFredHandler(BaseHTTPRequestHandler):
+    """
+    Serve /series/observations from the server's synthetic series
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = {key: values[0]
+                 for key, values in parse_qs(urlparse(self.path).query).items()}
+        server = self.server
+        with server.lock:
+            server.requests.append(query)
+            server.connections.add(self.client_address)
+        time.sleep(server.latency)
+
+        # Injected transient failures: alternate rate limiting and outages
+        with server.lock:
+            fail = server.random.random() < server.failure_rate
+        if fail:
+            with server.lock:
+                server.failures += 1
+            self.send_response(429 if server.failures % 2 else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        # Release/category listings page through every stub series
+        if urlparse(self.path).path.endswith(('/release/series', '/category/series')):
+            ids = sorted(server.series)
+            offset = int(query.get('offset', 0))
+            limit = int(query.get('limit', 1000))
+            seriess = [{'id': series_id, 'title': f"Synthetic {series_id}",
+                        'frequency_short': server.frequencies.get(series_id, 'D')}
+                       for series_id in ids[offset:offset + limit]]
+            listing = {'count': len(ids), 'offset': offset, 'limit': limit,
+                       'seriess': seriess}
+            self.send_json(json.dumps(listing).encode())
+            return
+
+        series_id = query.get('series_id')
+        if 'realtime_start' in query and series_id in server.vintages:
+            self.send_json(self.vintage_payload(server.vintages[series_id], query))
+            return
+        if series_id not in server.series:
+            self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        dates, values = server.series[series_id]
+        keep = dates >= query.get('observation_start', '0000-00-00')
+        self.send_json(make_payload(dates[keep], values[keep]))
+
+    def vintage_payload(self, vintages, query):
+        """
+        Versions valid inside the requested real-time window, one page
+        """
+        dates, values, starts, ends = vintages
+        window_start = query['realtime_start']
+        window_end = query.get('realtime_end', '9999-12-31')
+        keep = ((ends >= window_start) & (starts <= window_end)
+                & (dates >= query.get('observation_start', '')))
+        # FRED clips each period to the requested window
+        starts = np.where(starts[keep] < window_start, window_start, starts[keep])
+        ends = np.where(ends[keep] > window_end, window_end, ends[keep])
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 100000))
+        page = slice(offset, offset + limit)
+        return make_payload(dates[keep][page], values[keep][page], window_start,
+                            starts[page], ends[page], count=int(keep.sum()),
+                            offset=offset)
+
+    def send_json(self, body):
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up (for example on a read timeout)
+            pass
+
+def start_stub_server(series, latency=0.0, failure_rate=0.0, seed=0, frequencies=None,
+                      vintages=None):
+    """
+    Start a local FRED stand-in on a free port in a background thread
+
+    Example:
+    >>> server, base_url = start_stub_server({'DFF': make_series('DFF')},
+    ...                                      latency=0.05)
+    >>> server.shutdown()
+
+    Args:
+        series: Dict of series_id -> (dates, values) from make_series
+        latency: Seconds each request sleeps before answering
+        failure_rate: Share of requests answered with 429 or 503
+        seed: Seeds which requests fail
+        frequencies: Optional series_id -> FRED frequency_short for listings
+        vintages: Optional series_id -> make_vintages() output, served for
+            realtime_start/realtime_end requests
+
+    Returns:
+        (server, base_url); server.requests records every query,
+        server.connections the client address of every connection used and
+        server.failures counts injected failures
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFredHandler)
+    server.daemon_threads = True
+    server.series = series
+    server.frequencies = frequencies or {}
+    server.vintages = vintages or {}
+    server.latency = latency
+    server.requests = []
+    server.connections = set()
+    server.failure_rate = failure_rate
+    server.failures = 0
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def synthetic_indicators(start='1976-01-01', end='2024-12-31'):
+    """
+    Synthetic series for every configured indicator at its native frequency
+    """
+    return {
+        info['id']: make_series(info['id'], info.get('frequency', 'D'), start, end)
+        for info in INDICATORS.values()
+    }
+
+@contextmanager
+def stub_fred(series, latency=0.0, failure_rate=0.0, seed=0, frequencies=None,
+              vintages=None):
+    """
+    Point fred_loader at a stub server for the duration of the block
+
+    The stub has no quota, so the client-side rate limiter is lifted too.
+    """
+    server, base_url = start_stub_server(series, latency, failure_rate, seed,
+                                         frequencies, vintages)
+    original = fred_loader.BASE_URL, fred_loader.RATE_LIMITER
+    fred_loader.BASE_URL = base_url
+    fred_loader.RATE_LIMITER = fred_loader.TokenBucket(rate=1e9, burst=1e9)
+    try:
+        yield server
+    finally:
+        fred_loader.BASE_URL, fred_loader.RATE_LIMITER = original
+        server.shutdown()
+        server.server_close()
+
+def measure_failure_throughput(series, failure_rate, latency=0.0, rounds=3):
+    """
+    Load every indicator from a stub that fails a share of requests
+
+    Returns:
+        Result dict with series per second, requests sent, injected
+        failures and how many series still came back empty
+    """
+    with stub_fred(series, latency, failure_rate) as server:
+        started = time.perf_counter()
+        empty = 0
+        for _ in range(rounds):
+            df = fred_loader.fred_load(use_cache=False)
+            empty += int(df.isna().all().sum())
+        seconds = time.perf_counter() - started
+
+    loaded = rounds * len(series)
+    result = {
+        'name': 'fred_load_with_failures',
+        'rows': None,
+        'seconds_best': seconds / rounds,
+        'seconds_median': seconds / rounds,
+        'peak_mb': None,
+        'failure_rate': failure_rate,
+        'series_per_second': loaded / seconds,
+        'requests': len(server.requests),
+        'failures': server.failures,
+        'empty_series': empty,
+    }
+    print(f"{'fred_load_with_failures':<32}{result['seconds_best']:>10.4f}s"
+          f"{result['series_per_second']:>10.2f} series/s  "
+          f"{server.failures} failures, {empty} empty")
+    return result
+
+def measure_import_times(modules=('fred_config', 'fred_loader', 'fred_transformer',
+                                  'fred_stats', 'fred_visualizer', 'fred_report'),
+                         repeat=3):
+    """
+    Time a cold import of each module in a fresh interpreter
+
+    Uses python -X importtime, so only the module's own import tree is
+    counted and interpreter startup is excluded.
+
+    Returns:
+        List of result dicts
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        timings = []
+        for _ in range(repeat):
+            command = [sys.executable, '-X', 'importtime', '-c', f"import {module}"]
+            stderr = subprocess.run(command, capture_output=True, text=True, check=True,
+                                    cwd=cwd).stderr
+            # Last line is the requested module:
+            # "import time: self | cumulative | name"
+            last = stderr.strip().splitlines()[-1]
+            timings.append(int(last.split('|')[1]) / 1e6)
+        result = {'name': f"import_{module}", 'rows': None,
+                  'seconds_best': min(timings),
+                  'seconds_median': statistics.median(timings)}
+        print(f"{result['name']:<32}{result['seconds_best']:>10.4f}s")
+        results.append(result)
+    return results
+
+def measure_catalog(catalog_size=400, requested=(5, 50, 400), start='1976-01-01',
+                    end='2024-12-31', repeat=3):
+    """
+    Time listing, bulk fetch and subset loads for a large synthetic catalog
+
+    Loads of 5, 50 and 400 series from the same 400-series catalog should
+    grow with the number requested, not with the catalog.
+
+    Returns:
+        List of result dicts
+    """
+    import fred_catalog
+
+    series = {f"SYN{i:04d}": make_series(f"SYN{i:04d}", 'M', start, end)
+              for i in range(catalog_size)}
+    results = []
+    frequencies = dict.fromkeys(series, 'M')
+    with stub_fred(series, frequencies=frequencies), \
+            tempfile.TemporaryDirectory() as cache_dir:
+        def list_catalog():
+            return fred_catalog.catalog_from_fred('release', 1, page_size=100)
+
+        catalog = list_catalog()
+        results.append(measure('catalog_from_fred', list_catalog, 1, rows=len(catalog)))
+        results.append(measure(
+            'fred_fetch_catalog',
+            lambda: fred_catalog.fred_fetch_catalog(catalog, cache_dir=cache_dir),
+            1, rows=len(catalog)))
+        keys = list(catalog)
+        for count in requested:
+            results.append(measure(
+                'fred_load_catalog',
+                lambda: fred_catalog.fred_load_catalog(catalog, keys[:count], freq='M',
+                                                       cache_dir=cache_dir),
+                repeat, rows=count, catalog_size=len(catalog)))
+            results.append(measure(
+                'fred_load_catalog_long',
+                lambda: fred_catalog.fred_load_catalog(catalog, keys[:count],
+                                                       layout='long',
+                                                       cache_dir=cache_dir),
+                repeat, rows=count, catalog_size=len(catalog)))
+    return results
+
+def measure_vintages(start='1990-01-01', end='2024-12-31', snapshots=1000, repeat=3):
+    """
+    Time the vintage fetch and a rolling backtest of as-of snapshots
+
+    Every INDICATORS series gets synthetic revisions; after the first
+    update the snapshots are answered from the in-memory indexes alone.
+
+    Returns:
+        List of result dicts
+    """
+    import fred_vintage
+
+    vintages = {info['id']: make_vintages(info['id'], start, end)
+                for info in INDICATORS.values()}
+    dates = pd.date_range(start, end, periods=snapshots)
+    results = []
+    with stub_fred({}, vintages=vintages), tempfile.TemporaryDirectory() as store_dir:
+        store = fred_vintage.VintageStore(store_dir)
+        results.append(measure(
+            'vintage_update',
+            lambda: fred_vintage.VintageStore(store_dir).update_many(),
+            1, rows=sum(len(v[0]) for v in vintages.values())))
+        store.update_many()
+        results.append(measure('vintage_snapshots',
+                               lambda: sum(1 for _ in store.snapshots(dates)),
+                               repeat, rows=snapshots))
+    return results
+
+def measure(name, func, repeat=3, rows=None, **meta):
+    """
+    Time func (best and median of repeat runs) and record its peak memory
+
+    Memory is measured in a separate tracemalloc run so tracing overhead
+    does not distort the timings.
+
+    Returns:
+        Result dict for the JSON report
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'name': name,
+        'rows': rows,
+        'seconds_best': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_mb': peak / 2**20,
+        **meta,
+    }
+    print(f"{name:<32}{result['seconds_best']:>10.4f}s{result['peak_mb']:>10.2f} MB")
+    return result
+
+def measure_writers(df, repeat=3):
+    """
+    Time and size each fred_save format against the old full to_excel dump
+
+    Returns:
+        List of result dicts with the written size in KB
+    """
+    def save(path):
+        return fred_save(df, path)
+
+    writers = [
+        ('to_excel_full', 'stats.xlsx', lambda path: df.to_excel(path), 1),
+        ('fred_save_parquet', 'stats.parquet', save, repeat),
+        ('fred_save_arrow', 'stats.arrow', save, repeat),
+        ('fred_save_parquet_by_period', 'by_period',
+         lambda path: fred_save(df, path, format='parquet',
+                                partition_by='economic_period'), repeat),
+        ('fred_save_excel_summary', 'summary.xlsx', save, repeat),
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, filename, write, runs in writers:
+            path = os.path.join(tmpdir, filename)
+            result = measure(name, lambda: write(path), runs, rows=len(df))
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(root, f))
+                           for root, _, files in os.walk(path) for f in files)
+            else:
+                size = os.path.getsize(path)
+            result['size_kb'] = size / 2**10
+            results.append(result)
+    return results
+
+def run_benchmarks(start='1976-01-01', end='2024-12-31',
+                   payload_rows=(10_000, 100_000, 1_000_000), latency=0.05, repeat=3,
+                   include_export=False, failure_rate=0.2):
+    """
+    Benchmark each public entry point on synthetic data
+
+    Args:
+        start, end: History span of the synthetic indicators
+        payload_rows: Observation counts for the parser benchmark
+        latency: Injected per-request latency of the stub server
+        repeat: Timed runs per entry point
+        include_export: Also time figure building, the PDF export and the
+            file writers (the full to_excel baseline takes seconds)
+        failure_rate: Share of stub requests failing in the retry benchmark
+
+    Returns:
+        List of result dicts
+    """
+    results = measure_import_times(repeat=repeat)
+
+    # Parsing FRED payloads of increasing size
+    for rows in payload_rows:
+        dates, values = make_series('PARSE', 'D', '1900-01-01', rows=rows)
+        payload = make_payload(dates, values)
+        size = fred_loader.CHUNK_SIZE
+        chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+        results.append(measure('parse_observations',
+                               lambda: fred_loader.parse_observations(chunks),
+                               repeat, rows=rows, payload_mb=len(payload) / 2**20))
+
+    # Loading every indicator from the stub server
+    indicators = synthetic_indicators(start, end)
+    with stub_fred(indicators, latency):
+        raw = fred_loader.fred_load(use_cache=False)
+        results.append(measure('fred_load',
+                               lambda: fred_loader.fred_load(use_cache=False),
+                               repeat, rows=len(raw), latency=latency))
+
+    # Large catalogs: listing, bulk fetch and subset loads
+    results.extend(measure_catalog(start=start, end=end, repeat=repeat))
+
+    # Point-in-time snapshots from the vintage store
+    results.extend(measure_vintages(end=end, repeat=repeat))
+
+    # Throughput when a share of requests fail and must be retried
+    if failure_rate:
+        results.append(measure_failure_throughput(indicators, failure_rate, latency))
+
+    # Transformation steps and the full transform
+    filled = fill_missing_values(raw)
+    results.append(measure('fill_missing_values', lambda: fill_missing_values(raw),
+                           repeat, rows=len(raw)))
+    results.append(measure('create_forward_metrics',
+                           lambda: create_forward_metrics(filled.copy(),
+                                                          'delinquency_rate_loans',
+                                                          'loan_delinq'),
+                           repeat, rows=len(raw)))
+    results.append(measure('classify_periods', lambda: classify_periods(filled.copy()),
+                           repeat, rows=len(raw)))
+    results.append(measure('fred_transform',
+                           lambda: fred_transform(raw.copy(), start, memo=None),
+                           repeat, rows=len(raw)))
+    fred_transform(raw, start)
+    results.append(measure('fred_transform_memo_hit',
+                           lambda: fred_transform(raw, '2005-01-01'),
+                           repeat, rows=len(raw)))
+
+    # Statistics
+    df = fred_transform(raw.copy(), start, memo=None)
+    targets = [column for column in df.columns if column.startswith('loan_delinq_')]
+    stats_columns = ['option_adjusted_spread', 'delinquency_rate_loans']
+    results.append(measure('compute_regime_stats',
+                           lambda: compute_regime_stats(df, stats_columns,
+                                                        'option_adjusted_spread',
+                                                        targets),
+                           repeat, rows=len(df)))
+
+    # Sensitivity sweep: every monthly cut date within a year of each default
+    # boundary
+    from fred_sweep import fred_sweep
+    boundaries = [pd.date_range(pd.Timestamp(regime['start']) - pd.DateOffset(months=6),
+                                periods=12, freq='MS')
+                  for regime in REGIMES[1:]]
+    results.append(measure('fred_sweep', lambda: fred_sweep(df, boundaries), repeat,
+                           rows=len(df), scenarios=12 ** len(boundaries)))
+
+    # Plotting dependencies are only needed for these
+    import fred_visualizer
+    results.append(measure('create_stats_table',
+                           lambda: fred_visualizer.create_stats_table(df),
+                           repeat, rows=len(df)))
+
+    # Every row vs the point budget, built fresh each run, then served from the
+    # figure cache
+    budgets = [('plot_rolling_correlation_full', None),
+               ('plot_rolling_correlation', PLOT_POINT_BUDGET)]
+    for name, budget in budgets:
+        def build():
+            fred_visualizer.clear_figure_cache()
+            return fred_visualizer.plot_rolling_correlation(df, point_budget=budget)
+
+        figure = build()
+        results.append(measure(name, build, repeat, rows=len(df),
+                               json_kb=len(figure.to_json()) / 2**10))
+    results.append(measure('plot_rolling_correlation_cached',
+                           lambda: fred_visualizer.plot_rolling_correlation(df),
+                           repeat, rows=len(df)))
+
+    if include_export:
+        results.extend(measure_writers(df, repeat))
+
+        viz = fred_visualizer.prepare_viz_data(df, start)
+        figures = fred_visualizer.fred_visualize(viz)
+        results.append(measure('fred_visualize',
+                               lambda: fred_visualizer.fred_visualize(viz),
+                               1, rows=len(viz)))
+        export_path = os.path.join(os.getcwd(), 'benchmark_report.pdf')
+        try:
+            results.append(measure('fred_export',
+                                   lambda: fred_visualizer.fred_export(
+                                       *figures, filename=export_path),
+                                   1, rows=len(viz)))
+        finally:
+            if os.path.exists(export_path):
+                os.remove(export_path)
+
+    return results
+
+def git_revision():
+    """
+    Short commit hash of the working tree, or 'unknown' outside git
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def save_results(results, output_dir='benchmarks'):
+    """
+    Write results as JSON named after the current commit
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    path = os.path.join(output_dir, f"{revision}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def compare_results(baseline_path, current_path, threshold=1.10):
+    """
+    Print the timing ratio of each benchmark between two result files
+
+    Ratios above threshold are flagged as regressions.
+
+    Returns:
+        DataFrame with baseline, current and ratio per benchmark
+    """
+    def load(path):
+        with open(path) as f:
+            frame = pd.DataFrame(json.load(f)['results'])
+        frame['rows'] = frame['rows'].fillna(0).astype(int)
+        return frame.set_index(['name', 'rows'])['seconds_best']
+
+    comparison = pd.DataFrame({'baseline': load(baseline_path),
+                               'current': load(current_path)})
+    comparison['ratio'] = comparison['current'] / comparison['baseline']
+    comparison['regression'] = comparison['ratio'] > threshold
+    print(comparison.to_string(float_format='{:.4f}'.format))
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the FRED pipeline on synthetic data')
+    parser.add_argument('--start', default='1976-01-01',
+                        help='first synthetic observation date')
+    parser.add_argument('--end', default='2024-12-31',
+                        help='last synthetic observation date')
+    parser.add_argument('--payload-rows', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000],
+                        help='observation counts for the parser benchmark')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='stub server latency in seconds')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs per benchmark')
+    parser.add_argument('--failure-rate', type=float, default=0.2,
+                        help='share of stub requests failing in the retry benchmark '
+                             '(0 skips it)')
+    parser.add_argument('--export', action='store_true',
+                        help='also benchmark figures, PDF export and file writers')
+    parser.add_argument('--output-dir', default='benchmarks',
+                        help='directory for the JSON results')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.start, args.end, args.payload_rows, args.latency,
+                             args.repeat, args.export, args.failure_rate)
+    path = save_results(results, args.output_dir)
+    print(f"Results written to {path}")
+    if args.compare:
+        compare_results(args.compare, path)
+
+if __name__ == '__main__':
+    main()
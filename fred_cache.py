@@ -0,0 +1,95 @@
+# File for the local observation cache
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from fred_config import CACHE_DIR
+
+
+def cache_paths(series_id, cache_dir=CACHE_DIR):
+    """
+    Locate the Parquet store and metadata sidecar for one series
+    """
+    base = os.path.join(cache_dir, series_id)
+    return f"{base}.parquet", f"{base}.json"
+
+def read_cache(series_id, cache_dir=CACHE_DIR):
+    """
+    Read a cached series and its metadata
+
+    Returns:
+        (series, metadata) or (None, None) when the series is not cached
+    """
+    data_path, meta_path = cache_paths(series_id, cache_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, None
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    series = pd.read_parquet(data_path)['value']
+    series.index.name = 'date'
+    return series, meta
+
+def write_cache(series_id, series, start_date, vintage, cache_dir=CACHE_DIR):
+    """
+    Store a series with the metadata needed for delta refreshes
+
+    Metadata records when the fetch happened and which FRED vintage
+    (realtime_start) the observations reflect, so staleness is explicit.
+    Files are written to a temp name and swapped in to avoid torn reads.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = cache_paths(series_id, cache_dir)
+
+    meta = {
+        'series_id': series_id,
+        'start_date': str(pd.Timestamp(start_date).date()),
+        'last_observation': str(series.index.max().date()) if len(series) else None,
+        'rows': int(len(series)),
+        'vintage': vintage,
+        'fetched_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+    series.rename('value').to_frame().to_parquet(f"{data_path}.tmp", compression='zstd')
+    os.replace(f"{data_path}.tmp", data_path)
+    with open(f"{meta_path}.tmp", 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return meta
+
+def cache_age_hours(meta):
+    """
+    Hours since the cached series was last fetched
+    """
+    fetched_at = datetime.fromisoformat(meta['fetched_at'])
+    return (datetime.now(timezone.utc) - fetched_at).total_seconds() / 3600
+
+def frame_fingerprint(df):
+    """
+    Cheap content hash of a frame for use as a cache key
+
+    Example:
+    >>> frame_fingerprint(df)
+    '5f0c...'
+
+    Combines the shape, index bounds, column names and dtypes with one hash
+    per column (and the index). Numeric columns are hashed from their raw
+    bytes; other columns go through pandas' row hashing.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    layout = (df.shape, list(map(str, df.columns)), list(map(str, df.dtypes)))
+    digest.update(repr(layout).encode())
+    if len(df):
+        digest.update(repr((df.index[0], df.index[-1])).encode())
+
+    for values in [df.index, *(df[column] for column in df.columns)]:
+        array = values.to_numpy() if values.dtype.kind in 'biufcmM' else None
+        if array is None:
+            hashed = pd.util.hash_pandas_object(pd.Series(values), index=False)
+            array = hashed.to_numpy()
+        digest.update(np.ascontiguousarray(array).view('uint8'))
+    return digest.hexdigest()
@@ -0,0 +1,269 @@
+# File for indicator catalogs larger than the hand-written INDICATORS
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+import requests
+
+import fred_loader
+from fred_cache import read_cache
+from fred_config import CACHE_DIR, INDICATORS, MAX_WORKERS, START_DATE, get_api_key
+from fred_trace import redact, span
+
+# FRED frequency_short codes -> the loader's alignment frequencies. Weekly
+# series aggregate like daily ones; semiannual and annual ones carry forward.
+FREQUENCIES = {'D': 'D', 'W': 'D', 'BW': 'D', 'M': 'M', 'Q': 'Q', 'SA': 'Y', 'A': 'Y'}
+
+# FRED listing endpoints and the parameter identifying each listing
+LISTINGS = {
+    'release': ('release/series', 'release_id'),
+    'category': ('category/series', 'category_id'),
+}
+
+# Fields every catalog entry carries, in file column order
+CATALOG_FIELDS = ['key', 'id', 'name', 'description', 'frequency', 'agg']
+
+
+def catalog_entry(series_id, name=None, description='', frequency='D', agg=None):
+    """
+    Build one catalog entry in the same shape as fred_config.INDICATORS
+    """
+    frequency = FREQUENCIES.get(frequency, frequency)
+    return {
+        'id': series_id,
+        'name': name or series_id,
+        'description': description,
+        'frequency': frequency,
+        # Levels observed at a point in time are sampled, rates averaged
+        'agg': agg or ('mean' if frequency in ('D', 'M') else 'last'),
+    }
+
+def read_catalog(path):
+    """
+    Load catalog entries from a JSON or CSV file
+
+    Example:
+    >>> catalog = read_catalog('regional_unemployment.csv')
+
+    JSON files hold either a {key: entry} dict like INDICATORS or a list of
+    entries with a 'key'. CSV files have a header row with the
+    CATALOG_FIELDS columns; only 'id' is required (key defaults to the
+    lower-cased series id).
+
+    Returns:
+        Dict of key -> entry
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rows = [{'key': key, **entry} for key, entry in data.items()]
+        else:
+            rows = data
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    catalog = {}
+    for row in rows:
+        key = row.get('key') or row['id'].lower()
+        catalog[key] = catalog_entry(row['id'], row.get('name'),
+                                     row.get('description') or '',
+                                     row.get('frequency') or 'D',
+                                     row.get('agg') or None)
+    return catalog
+
+def write_catalog(catalog, path):
+    """
+    Save a catalog as JSON or CSV (chosen by the extension)
+    """
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(catalog, f, indent=2)
+        return path
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CATALOG_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for key, entry in catalog.items():
+            writer.writerow({'key': key, **entry})
+    return path
+
+def catalog_from_fred(listing, listing_id, session=None, page_size=1000, **filters):
+    """
+    Build a catalog from every series in a FRED release or category
+
+    Example:
+    >>> catalog = catalog_from_fred('release', 112)  # state unemployment
+    >>> catalog = catalog_from_fred('category', 32250, filter_variable='frequency',
+    ...                             filter_value='Monthly')
+
+    Pages through the listing page_size series at a time under the same
+    rate limiter and retry policy as observation requests. Extra keyword
+    arguments are passed to FRED as query parameters.
+
+    Args:
+        listing: 'release' or 'category'
+        listing_id: FRED release_id or category_id
+        session: Optional requests session to reuse pooled connections
+        page_size: Series per request (FRED allows up to 1000)
+
+    Returns:
+        Dict of lower-cased series id -> entry
+    """
+    endpoint, id_param = LISTINGS[listing]
+    http = session if session is not None else requests
+    catalog = {}
+    offset = 0
+
+    with span('catalog', listing=listing, listing_id=listing_id) as listing_span:
+        while True:
+            params = {id_param: listing_id, 'api_key': get_api_key(),
+                      'file_type': 'json', 'limit': page_size, 'offset': offset,
+                      **filters}
+
+            def fetch_once():
+                response = http.get(f"{fred_loader.BASE_URL}/{endpoint}", params=params,
+                                    timeout=fred_loader.REQUEST_TIMEOUT)
+                response.raise_for_status()
+                return response.json()
+
+            try:
+                page = fred_loader.with_retries(fetch_once, f"{listing} {listing_id}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Couldn't list {listing} {listing_id} at offset {offset}. "
+                      f"Error: {redact(e)}")
+                break
+
+            for series in page.get('seriess', []):
+                catalog[series['id'].lower()] = catalog_entry(
+                    series['id'], series.get('title'),
+                    series.get('notes', '').strip()[:200],
+                    series.get('frequency_short', 'D'))
+
+            offset += page_size
+            if offset >= page.get('count', 0):
+                break
+
+        listing_span.set(series=len(catalog))
+    return catalog
+
+def select(catalog, names=None):
+    """
+    The catalog entries for names (every entry when names is None)
+    """
+    if names is None:
+        return dict(catalog)
+    missing = [name for name in names if name not in catalog]
+    if missing:
+        raise KeyError(f"Not in catalog: {missing}")
+    return {name: catalog[name] for name in names}
+
+def load_entries(entries, start_date=START_DATE, max_workers=MAX_WORKERS,
+                 cache_dir=CACHE_DIR):
+    """
+    Load catalog entries through the local cache on a shared session
+
+    Returns:
+        Dict of key -> Series, in entry order
+    """
+    def load(session, key, entry):
+        return fred_loader.load_series(entry['id'], start_date, session, cache_dir)
+
+    return fred_loader.map_series(load, entries, max_workers)
+
+def fred_fetch_catalog(catalog=INDICATORS, names=None, start_date=START_DATE,
+                       max_workers=MAX_WORKERS, cache_dir=CACHE_DIR):
+    """
+    Fetch catalog series into the local Parquet cache without building a frame
+
+    Example:
+    >>> summary = fred_fetch_catalog(catalog)
+
+    Each series goes through load_series (full download the first time,
+    a delta refresh afterwards) and is dropped as soon as it is stored, so
+    memory stays at max_workers series however large the catalog.
+
+    Returns:
+        DataFrame with rows, first and last observation per key
+    """
+    entries = select(catalog, names)
+
+    def store(session, key, entry):
+        series = fred_loader.load_series(entry['id'], start_date, session, cache_dir)
+        return {'key': key, 'id': entry['id'], 'rows': len(series),
+                'first_observation': series.index.min() if len(series) else None,
+                'last_observation': series.index.max() if len(series) else None}
+
+    with span('fred_fetch_catalog', series=len(entries)):
+        stored = fred_loader.map_series(store, entries, max_workers)
+        return pd.DataFrame(list(stored.values()))
+
+def fred_load_catalog(catalog=INDICATORS, names=None, layout='wide', freq=None,
+                      start_date=START_DATE, refresh=False, max_workers=MAX_WORKERS,
+                      cache_dir=CACHE_DIR):
+    """
+    Load only the requested catalog series, wide or long
+
+    Example:
+    >>> wide = fred_load_catalog(catalog, ['caur', 'txur', 'nyur'], freq='M')
+    >>> long = fred_load_catalog(catalog, layout='long')
+
+    Series are read from the local cache (fetching any that are missing);
+    refresh=True runs the usual delta refresh on each first. Only the named
+    series are read, so time and memory grow with len(names), not catalog
+    size.
+
+    Args:
+        catalog: Dict of key -> entry (INDICATORS, read_catalog(), ...)
+        names: Keys to load; None loads the whole catalog
+        layout: 'wide' for one column per series (aligned with
+            align_series when freq is given) or 'long' for date, key and
+            value rows with key as a categorical
+        freq: Alignment frequency for the wide layout
+        start_date: First observation date
+        refresh: Request new observations for cached series
+
+    Returns:
+        DataFrame in the requested layout
+    """
+    entries = select(catalog, names)
+    start_date = pd.Timestamp(start_date)
+
+    with span('fred_load_catalog', series=len(entries), layout=layout) as load:
+        series = {}
+        stale = {}
+        for key, entry in entries.items():
+            if refresh:
+                cached, meta = None, None
+            else:
+                cached, meta = read_cache(entry['id'], cache_dir)
+            if cached is None or pd.Timestamp(meta['start_date']) > start_date:
+                stale[key] = entry
+            else:
+                series[key] = cached[cached.index >= start_date]
+        if stale:
+            series.update(load_entries(stale, start_date, max_workers, cache_dir))
+        series = {key: series[key] for key in entries}
+
+        if layout == 'long':
+            lengths = [len(values) for values in series.values()]
+            dates = [values.index.to_numpy() for values in series.values()]
+            floats = [values.to_numpy(dtype='float64') for values in series.values()]
+            df = pd.DataFrame({
+                'date': (np.concatenate(dates) if series
+                         else np.array([], dtype='datetime64[ns]')),
+                'key': pd.Categorical.from_codes(
+                    np.repeat(np.arange(len(series)), lengths),
+                    categories=list(series)),
+                'value': (np.concatenate(floats) if series
+                          else np.array([], dtype='float64')),
+            })
+        elif layout == 'wide':
+            df = fred_loader.align_series(series, freq, entries)
+        else:
+            raise ValueError(f"Unknown layout '{layout}'")
+
+        load.set(rows=len(df))
+    return df
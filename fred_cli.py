@@ -0,0 +1,230 @@
+# File for the command-line pipeline with incremental rebuilds
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import time
+
+import fred_config
+
+# Pipeline stages in dependency order. Each stage is rebuilt only when its
+# key changes: a hash of its upstream outputs, the config values and
+# parameters it reads, and the source of the modules that implement it.
+STAGES = [
+    {'name': 'fetch', 'inputs': [], 'config': ['INDICATORS', 'START_DATE'],
+     'params': [], 'modules': ['fred_loader', 'fred_cache'],
+     'outputs': ['raw.parquet']},
+    {'name': 'transform', 'inputs': ['fetch'], 'config': ['REGIMES', 'FILL_POLICIES'],
+     'params': ['start'], 'modules': ['fred_transformer', 'fred_writer'],
+     'outputs': ['transformed.parquet']},
+    {'name': 'stats', 'inputs': ['transform'], 'config': [], 'params': [],
+     'modules': ['fred_stats'],
+     'outputs': ['regime_stats.parquet', 'regression_grid.parquet']},
+    {'name': 'figures', 'inputs': ['transform'],
+     'config': ['REGIMES', 'PLOT_POINT_BUDGET', 'PLOT_DOWNSAMPLE', 'PLOT_WEBGL'],
+     'params': [],
+     'modules': ['fred_visualizer', 'fred_stats', 'fred_downsample', 'fred_cache'],
+     'outputs': ['stats_table.json', 'covid_plot.json', 'pregfc_plot.json',
+                 'time_series_plot.json']},
+    {'name': 'pdf', 'inputs': ['figures'], 'config': [], 'params': ['title'],
+     'modules': ['fred_visualizer'], 'outputs': ['fred_analysis.pdf']},
+]
+STAGE_NAMES = [stage['name'] for stage in STAGES]
+
+MANIFEST = 'manifest.json'
+BUILD_DIR = '.fred_build'
+
+def file_digest(paths):
+    """
+    SHA-256 over the bytes of one or more files, in order
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def module_digest(names):
+    """
+    Hash the source of the given modules so code edits invalidate a stage
+    """
+    return file_digest([importlib.util.find_spec(name).origin for name in names])
+
+def stage_key(stage, manifest, args):
+    """
+    Hash everything a stage's output depends on
+    """
+    payload = {
+        'stage': stage['name'],
+        'inputs': {name: manifest.get(name, {}).get('content')
+                   for name in stage['inputs']},
+        'config': {name: getattr(fred_config, name) for name in stage['config']},
+        'params': {name: getattr(args, name) for name in stage['params']},
+        'code': module_digest(stage['modules']),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def run_fetch(paths, inputs, args):
+    from fred_loader import fred_load
+    from fred_writer import fred_save
+
+    df = fred_load(use_cache=not args.no_cache)
+    df.index.name = 'date'
+    fred_save(df, paths[0])
+
+def run_transform(paths, inputs, args):
+    from fred_transformer import fred_transform
+    from fred_writer import fred_read, fred_save
+
+    df = fred_transform(fred_read(inputs['fetch'][0]), args.start)
+    fred_save(df, paths[0])
+
+def run_stats(paths, inputs, args):
+    from fred_stats import compute_regime_stats, fit_regression_grid
+    from fred_writer import fred_read
+
+    df = fred_read(inputs['transform'][0])
+    targets = [column for column in df.columns if column.startswith('loan_delinq_')]
+    columns = ['option_adjusted_spread', 'delinquency_rate_loans', 'quarterly_spread']
+    compute_regime_stats(df, columns, 'option_adjusted_spread',
+                         targets).to_parquet(paths[0])
+    fit_regression_grid(df, ['quarterly_spread', 'option_adjusted_spread'],
+                        targets).to_parquet(paths[1])
+
+def run_figures(paths, inputs, args):
+    from fred_visualizer import fred_visualize
+    from fred_writer import fred_read
+
+    figures = fred_visualize(fred_read(inputs['transform'][0]))
+    for figure, path in zip(figures, paths):
+        figure.write_json(path)
+
+def run_pdf(paths, inputs, args):
+    import plotly.io as pio
+
+    from fred_visualizer import fred_export
+
+    figures = [pio.read_json(path) for path in inputs['figures']]
+    fred_export(*figures, filename=paths[0], title=args.title)
+
+RUNNERS = {
+    'fetch': run_fetch,
+    'transform': run_transform,
+    'stats': run_stats,
+    'figures': run_figures,
+    'pdf': run_pdf,
+}
+
+def load_manifest(build_dir):
+    path = os.path.join(build_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, build_dir):
+    path = os.path.join(build_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def required_stages(target):
+    """
+    The target stage and everything upstream of it, in pipeline order
+    """
+    by_name = {stage['name']: stage for stage in STAGES}
+    needed = set()
+    pending = [target]
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name]['inputs'])
+    return [stage for stage in STAGES if stage['name'] in needed]
+
+def fred_build(target='pdf', args=None, build_dir=BUILD_DIR):
+    """
+    Bring the target stage up to date, rebuilding only invalidated stages
+
+    Example:
+    >>> fred_build('stats')
+    >>> fred_build('pdf', build_parser().parse_args(['--start', '2000-01-01']))
+
+    fetch always runs (the local observation cache keeps it to a small
+    delta request) unless offline is set, but its output is content-hashed:
+    when FRED has published nothing new the downstream keys are unchanged
+    and those stages are skipped.
+
+    Args:
+        target: Stage name; its upstream stages are brought up to date first
+        args: Options as parsed by build_parser() (defaults when omitted)
+        build_dir: Directory for stage outputs and manifest.json
+
+    Returns:
+        Manifest dict with each stage's key, content hash and outputs
+    """
+    if args is None:
+        args = build_parser().parse_args([target])
+    os.makedirs(build_dir, exist_ok=True)
+    manifest = load_manifest(build_dir)
+
+    for stage in required_stages(target):
+        name = stage['name']
+        paths = [os.path.join(build_dir, output) for output in stage['outputs']]
+        key = stage_key(stage, manifest, args)
+        previous = manifest.get(name, {})
+        current = (previous.get('key') == key
+                   and all(os.path.exists(path) for path in paths))
+        always_run = name == 'fetch' and not args.offline
+
+        if current and not always_run and not args.force:
+            print(f"{name:<10} up to date")
+            continue
+
+        inputs = {upstream: manifest[upstream]['outputs']
+                  for upstream in stage['inputs']}
+        started = time.perf_counter()
+        RUNNERS[name](paths, inputs, args)
+        seconds = time.perf_counter() - started
+
+        content = file_digest(paths)
+        status = 'unchanged' if content == previous.get('content') else 'rebuilt'
+        print(f"{name:<10} {status} in {seconds:.2f}s")
+        manifest[name] = {'key': key, 'content': content, 'outputs': paths,
+                          'seconds': seconds,
+                          'built_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        save_manifest(manifest, build_dir)
+
+    return manifest
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='fred', description='Build the FRED analysis incrementally')
+    parser.add_argument('stage', nargs='?', default='pdf', choices=STAGE_NAMES,
+                        help='stage to bring up to date, with everything it depends '
+                             'on (default: pdf)')
+    parser.add_argument('--start', default='1996-12-31',
+                        help='analysis start date for the transform')
+    parser.add_argument('--title', default='FRED Economic Analysis',
+                        help='PDF report title')
+    parser.add_argument('--build-dir', default=BUILD_DIR,
+                        help='directory for stage outputs and the manifest')
+    parser.add_argument('--offline', action='store_true',
+                        help='reuse the last fetch instead of calling FRED')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='fetch full histories, bypassing the local cache')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every requested stage')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manifest = fred_build(args.stage, args, args.build_dir)
+    for path in manifest[args.stage]['outputs']:
+        print(path)
+
+if __name__ == '__main__':
+    main()
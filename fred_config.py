@@ -1,69 +1,172 @@
 # config.py
 import os
 
-from dotenv import load_dotenv
+# The API key is resolved (reading .env if present) the first time a request
+# needs it, not at import, so importing the config costs nothing.
+_API_KEY = None
 
-load_dotenv()
+def get_api_key():
+    """
+    Return FRED_API_KEY from the environment, loading .env on first use
+    """
+    global _API_KEY
+    if _API_KEY is None:
+        if 'FRED_API_KEY' not in os.environ:
+            from dotenv import load_dotenv
+            load_dotenv()
+        _API_KEY = os.getenv('FRED_API_KEY')
+    return _API_KEY
+
+def __getattr__(name):
+    # Keeps `from fred_config import API_KEY` working, resolved lazily
+    if name == 'API_KEY':
+        return get_api_key()
+    raise AttributeError(f"module 'fred_config' has no attribute '{name}'")
 
-API_KEY = os.getenv('FRED_API_KEY')
 BASE_URL = 'https://api.stlouisfed.org/fred'
 START_DATE = '1976-01-01'
 
-# Economic indicators with their FRED codes and descriptions
+# Concurrent fetching: worker threads share one keep-alive connection pool.
+# FRED allows 120 requests per minute per key, so keep the pool small.
+MAX_WORKERS = 4
+
+# Request resilience: (connect, read) timeouts in seconds, retries with
+# exponential backoff and full jitter for transient failures, and a
+# client-side token bucket matched to FRED's 120 requests/minute quota.
+REQUEST_TIMEOUT = (5, 30)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RATE_LIMIT_PER_MINUTE = 120
+RATE_LIMIT_BURST = 10
+
+# Local observation cache: one Parquet store per series_id. Refreshes only
+# request observations after the last cached date, minus a revision window
+# so recently revised values are picked up. Cached series younger than
+# CACHE_MAX_AGE_HOURS are served without a request.
+CACHE_DIR = os.getenv('FRED_CACHE_DIR', '.fred_cache')
+REVISION_WINDOW_DAYS = 180
+CACHE_MAX_AGE_HOURS = 0
+
+# Point-in-time store: every published version (ALFRED vintage) of each
+# series, used for as-of queries in backtests.
+VINTAGE_DIR = os.path.join(CACHE_DIR, 'vintages')
+
+# Memoized transforms: the most recent TRANSFORM_MEMO_SIZE full-history
+# results are kept in memory, keyed on a fingerprint of the input frame.
+# Set TRANSFORM_MEMO_DIR to also keep them on disk across sessions.
+TRANSFORM_MEMO_SIZE = 8
+TRANSFORM_MEMO_DIR = None
+
+# Interactive figures: line traces longer than PLOT_POINT_BUDGET points are
+# downsampled ('lttb' or 'minmax') and scatters drop duplicate points before
+# they reach Plotly. PLOT_WEBGL draws with scattergl. The last
+# FIGURE_CACHE_SIZE figures are cached on a fingerprint of the data plus the
+# builder's arguments (0 disables the cache).
+PLOT_POINT_BUDGET = 2000
+PLOT_DOWNSAMPLE = 'lttb'
+PLOT_WEBGL = False
+FIGURE_CACHE_SIZE = 32
+
+# Economic indicators with their FRED codes and descriptions.
+# 'frequency' is the native observation frequency (D/M/Q) and 'agg' is how
+# the series is aggregated when aligned to a coarser frequency; aligning to a
+# finer frequency forward-fills the last observation.
 INDICATORS = {
    'yield_spread': {
        'id': 'T10Y2Y',
        'name': 'Treasury Yield Spread (10Y-2Y)',
-       'description': 'Difference between 10-Year and 2-Year Treasury Constant Maturity Rates'
+       'description': 'Difference between 10-Year and 2-Year Treasury Constant Maturity Rates',
+       'frequency': 'D',
+       'agg': 'mean'
    },
    'gdp': {
        'id': 'GDPC1', 
        'name': 'Real GDP',
-       'description': 'Real Gross Domestic Product'
+       'description': 'Real Gross Domestic Product',
+       'frequency': 'Q',
+       'agg': 'last'
    },
    'fed_funds': {
        'id': 'DFF',
        'name': 'Federal Funds Rate',
-       'description': 'Federal Funds Effective Rate'
+       'description': 'Federal Funds Effective Rate',
+       'frequency': 'D',
+       'agg': 'mean'
    },
    'unemployment': {
        'id': 'UNRATE',
        'name': 'Unemployment Rate',
-       'description': 'Civilian Unemployment Rate'
+       'description': 'Civilian Unemployment Rate',
+       'frequency': 'M',
+       'agg': 'mean'
    },
    'option_adjusted_spread': {
        'id': 'BAMLH0A0HYM2',
        'name': 'High Yield Bond Spread',
-       'description': 'ICE BofA US High Yield Index Option-Adjusted Spread'
+       'description': 'ICE BofA US High Yield Index Option-Adjusted Spread',
+       'frequency': 'D',
+       'agg': 'mean'
    },
    'delinquency_rate_credit_cards': {
        'id': 'DRCCLACBS',
        'name': 'Credit Card Delinquency Rate',
-       'description': 'Delinquency Rate on Credit Card Loans'
+       'description': 'Delinquency Rate on Credit Card Loans',
+       'frequency': 'Q',
+       'agg': 'last'
    },
    
    'delinquency_rate_loans': {
        'id': 'DRBLACBS',
        'name': 'Business Loan Delinquency Rate',
-       'description': 'Delinquency Rate on Business Loans'
+       'description': 'Delinquency Rate on Business Loans',
+       'frequency': 'Q',
+       'agg': 'last'
    },
     'cpi': {
        'id': 'CPIAUCSL',
        'name': 'Consumer Price Index',
-       'description': 'Measures average change in prices paid by consumers. Main inflation indicator.'
+       'description': 'Measures average change in prices paid by consumers. Main inflation indicator.',
+       'frequency': 'M',
+       'agg': 'mean'
    },
         'pce': {
        'id': 'PCEPI',
        'name': 'PCE Price Index',
-       'description': 'Federal Reserve\'s preferred inflation measure. Tracks personal consumption costs.'
+       'description': 'Federal Reserve\'s preferred inflation measure. Tracks personal consumption costs.',
+       'frequency': 'M',
+       'agg': 'mean'
    }
    
 }
 
+# Missing-value fill policy per column, applied by fill_missing_values in one
+# pass over the date-sorted frame. 'method' is ffill, bfill or interpolate
+# (linear in time between the neighbouring observations); 'limit' caps the
+# rows filled from one observation and 'max_gap_days' how far (in days) a
+# value may be carried. Quarterly rates are carried through their quarter
+# only; the daily spread bridges weekends and holidays.
+FILL_POLICIES = {
+   'delinquency_rate_credit_cards': {'method': 'ffill', 'limit': None,
+                                     'max_gap_days': 92},
+   'delinquency_rate_loans': {'method': 'ffill', 'limit': None, 'max_gap_days': 92},
+   'option_adjusted_spread': {'method': 'ffill', 'limit': None, 'max_gap_days': 7},
+}
+
+# Economic regimes in date order. Each regime runs from its start date up to
+# the next regime's start; a start of None is open-ended. Labels may repeat,
+# so alternating sets like NBER expansions/recessions work without code edits.
+REGIMES = [
+   {'label': 'Pre-GFC (1996-2007)', 'start': None,
+    'color': '#0081AF'},  # Blue
+   {'label': 'Great Recession (2008-2010)', 'start': '2007-10-01',
+    'color': '#2D936C'},  # Green
+   {'label': 'Post-Crisis (2010-2020)', 'start': '2009-06-30',
+    'color': '#764B8E'},  # Purple
+   {'label': 'Covid to Present (2020-2024)', 'start': '2020-01-01',
+    'color': '#9E2A2B'}  # Red
+]
+
 # Colors for visualizations
-COLORS = {
-   'Pre-GFC (1996-2007)': '#0081AF',    # Blue
-   'Great Recession (2008-2010)': '#2D936C',  # Green
-   'Post-Crisis (2010-2020)': '#764B8E', # Purple
-   'Covid to Present (2020-2024)': '#9E2A2B'      # Red
-}
\ No newline at end of file
+COLORS = {regime['label']: regime['color'] for regime in REGIMES}
@@ -0,0 +1,138 @@
+# File for reducing long series to a point budget before plotting
+import numpy as np
+
+# Downsampling methods for line traces
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+def _numeric(x):
+    """
+    x as float64 (datetimes as nanoseconds) for distance calculations
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype('int64').astype('float64')
+    return x.astype('float64')
+
+def lttb_indices(x, y, budget):
+    """
+    Positions of budget points chosen by Largest-Triangle-Three-Buckets
+
+    The first and last points are kept; every bucket in between keeps the
+    point forming the largest triangle with the point kept in the previous
+    bucket and the mean of the next bucket, which preserves the peaks and
+    turns of a line. x and y must be free of NaNs.
+
+    Returns:
+        Sorted int64 positions into x and y
+    """
+    length = len(y)
+    if budget >= length or budget < 3:
+        return np.arange(length)
+
+    x = _numeric(x)
+    y = np.asarray(y, dtype='float64')
+    # Bucket edges over the points strictly between the first and the last
+    edges = np.linspace(1, length - 1, budget - 1).astype('int64')
+    prefix_x = np.concatenate([[0.0], np.cumsum(x)])
+    prefix_y = np.concatenate([[0.0], np.cumsum(y)])
+
+    kept = np.empty(budget, dtype='int64')
+    kept[0], kept[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(budget - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Mean of the next bucket (the last point for the final bucket)
+        next_start = stop
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        count = next_stop - next_start
+        mean_x = (prefix_x[next_stop] - prefix_x[next_start]) / count
+        mean_y = (prefix_y[next_stop] - prefix_y[next_start]) / count
+
+        area = np.abs((x[previous] - mean_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+def minmax_indices(y, budget):
+    """
+    Positions of the minimum and maximum of each of budget // 2 buckets
+
+    Cheaper than LTTB and keeps every extreme, at the cost of some detail
+    between them. y must be free of NaNs.
+
+    Returns:
+        Sorted int64 positions into y
+    """
+    length = len(y)
+    if budget >= length or budget < 4:
+        return np.arange(length)
+
+    y = np.asarray(y, dtype='float64')
+    buckets = np.arange(length) * (budget // 2) // length
+    # Within each bucket, order by value: the first is the min, the last the max
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    ends = np.r_[starts[1:], length] - 1
+    return np.unique(np.concatenate([order[starts], order[ends], [0, length - 1]]))
+
+def line_indices(x, y, budget, method='lttb'):
+    """
+    Positions of a line's points to plot within budget
+
+    NaN points are not candidates, but the first NaN after each run of
+    values is kept so gaps in the line still render as gaps.
+
+    Example:
+    >>> positions = line_indices(series.index, series.to_numpy(), 2000)
+    >>> go.Scatter(x=series.index[positions], y=series.to_numpy()[positions])
+
+    Args:
+        x: Dates or numbers, sorted ascending
+        y: Values, NaN where missing
+        budget: Most points to keep (not counting gap markers)
+        method: 'lttb' or 'minmax'
+
+    Returns:
+        Sorted int64 positions into x and y
+    """
+    y = np.asarray(y, dtype='float64')
+    valid = np.flatnonzero(~np.isnan(y))
+    if budget is None or len(valid) <= budget:
+        return np.arange(len(y))
+
+    if method == 'lttb':
+        kept = lttb_indices(np.asarray(x)[valid], y[valid], budget)
+    elif method == 'minmax':
+        kept = minmax_indices(y[valid], budget)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}'")
+
+    missing = np.isnan(y)
+    gaps = np.flatnonzero(missing[1:] & ~missing[:-1]) + 1
+    return np.union1d(valid[kept], gaps)
+
+def scatter_indices(x, y, budget):
+    """
+    Positions of a scatter's points to plot within budget
+
+    Exact duplicates are dropped first, which is lossless: quarterly
+    series repeated on every daily row collapse to one point per quarter.
+    If more than budget distinct points remain, the points are ordered by
+    x and the min/max of y in each bucket is kept so the envelope and
+    outliers survive. Points missing x or y are dropped, as Plotly would.
+
+    Returns:
+        Sorted int64 positions into x and y
+    """
+    x = _numeric(x)
+    y = np.asarray(y, dtype='float64')
+    valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    points = np.column_stack([x[valid], y[valid]])
+    _, first = np.unique(points, axis=0, return_index=True)
+    first = valid[first]
+    if budget is None or len(first) <= budget:
+        return np.sort(first)
+
+    # first is already ordered by x, then y
+    return np.sort(first[minmax_indices(y[first], budget)])
@@ -1,57 +1,534 @@
 # File specifically for data extraction
+import codecs
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+from fred_cache import cache_age_hours, read_cache, write_cache
+from fred_config import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    BASE_URL,
+    CACHE_DIR,
+    CACHE_MAX_AGE_HOURS,
+    INDICATORS,
+    MAX_RETRIES,
+    MAX_WORKERS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_MINUTE,
+    REQUEST_TIMEOUT,
+    RETRY_STATUS,
+    REVISION_WINDOW_DAYS,
+    START_DATE,
+    get_api_key,
+)
+from fred_trace import redact, span
+
+
+def create_session(max_workers=MAX_WORKERS):
+    """
+    Create a requests session with one keep-alive connection pool
+
+    The pool holds one connection per worker thread so concurrent fetches
+    reuse sockets instead of opening a new TLS connection per series.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Separators between observation objects
+_SEPARATORS = re.compile(r'[\s,]*')
+# Bytes read from the response per parsing step
+CHUNK_SIZE = 64 * 1024
+
+def parse_observations(chunks, realtime=False):
+    """
+    Decode a FRED observations payload incrementally into NumPy arrays
+
+    The payload is read chunk by chunk and each observation object is decoded
+    on its own, straight into datetime64/float64 arrays preallocated from the
+    payload's 'count' field. FRED's '.' missing marker becomes NaN in the same
+    pass, so neither the full JSON text nor a list of dicts is ever held.
+
+    Args:
+        chunks: Iterable of bytes (like response.iter_content())
+        realtime: Also collect each observation's realtime_start and
+            realtime_end (the vintage interval it was valid for)
+
+    Returns:
+        (dates, values, header) where header holds the top-level fields
+        that precede the observations array. With realtime, the
+        realtime_start and realtime_end arrays are appended to the tuple.
+    """
+    chunks = iter(chunks)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    decode_object = json.JSONDecoder().raw_decode
+
+    # Read until the observations array opens
+    buffer, key, start = '', -1, -1
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        key = buffer.find('"observations"')
+        start = buffer.find('[', key) if key >= 0 else -1
+        if start >= 0:
+            break
+    if start < 0:
+        raise ValueError("Payload has no observations array")
+
+    header = json.loads(buffer[:key].rstrip().rstrip(',') + '}')
+    size = header.get('count') or 1024
+    dates = np.empty(size, dtype='datetime64[D]')
+    values = np.empty(size, dtype='float64')
+    if realtime:
+        starts = np.empty(size, dtype='datetime64[D]')
+        ends = np.empty(size, dtype='datetime64[D]')
+
+    n = 0
+    pos = start + 1
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            break
+        try:
+            obs, end = decode_object(buffer, pos)
+        except json.JSONDecodeError:
+            # Object runs past the buffer: pull the next chunk and retry
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise
+            buffer = buffer[pos:] + decoder.decode(chunk)
+            pos = 0
+            continue
+
+        if n == len(dates):
+            dates = np.resize(dates, 2 * n)
+            values = np.resize(values, 2 * n)
+            if realtime:
+                starts = np.resize(starts, 2 * n)
+                ends = np.resize(ends, 2 * n)
+        dates[n] = obs['date']
+        value = obs['value']
+        values[n] = np.nan if value == '.' else float(value)
+        if realtime:
+            starts[n] = obs['realtime_start']
+            ends[n] = obs['realtime_end']
+        n += 1
+        pos = end
+
+    # Drain the closing brace so the connection can go back to the pool
+    for _ in chunks:
+        pass
+
+    if realtime:
+        return dates[:n], values[:n], header, starts[:n], ends[:n]
+    return dates[:n], values[:n], header
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how fast requests are sent
+
+    Tokens refill at rate per second up to burst; acquire() blocks until a
+    token is available.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                refill = (now - self.updated) * self.rate
+                self.tokens = min(self.burst, self.tokens + refill)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
-from fred_config import API_KEY, BASE_URL, INDICATORS, START_DATE
+# Shared by every thread so the whole process stays inside FRED's quota
+RATE_LIMITER = TokenBucket(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+
+def is_retryable(error):
+    """
+    Whether a failed request is worth retrying (timeouts, dropped
+    connections, rate limiting and server errors)
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUS
+    return isinstance(error, (requests.exceptions.Timeout,
+                              requests.exceptions.ConnectionError,
+                              requests.exceptions.ChunkedEncodingError))
+
+def backoff_delay(attempt, error=None):
+    """
+    Seconds to wait before the next attempt
+
+    Uses full jitter over an exponentially growing cap, or the server's
+    Retry-After header when it sends one.
+    """
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def with_retries(fetch_once, label):
+    """
+    Call fetch_once() under the rate limiter, retrying transient failures
+
+    Non-retryable errors and the last failure are raised to the caller.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        RATE_LIMITER.acquire()
+        try:
+            return fetch_once()
+        except requests.exceptions.RequestException as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"Retrying {label} in {delay:.1f}s "
+                  f"(attempt {attempt + 1} of {MAX_RETRIES}). Error: {redact(e)}")
+            time.sleep(delay)
 
+# Requests currently running, keyed on (series_id, start_date)
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
 
-def get_fred_data(series_id, start_date=START_DATE):
+def get_fred_data(series_id, start_date=START_DATE, session=None, realtime_start=None,
+                  realtime_end=None):
     """
     Get economic data from FRED API
     
     Example:
     >>> unemployment_data = get_fred_data('UNRATE', '2000-01-01')
+    >>> vintages = get_fred_data('UNRATE', '2000-01-01', realtime_start='2005-01-01',
+    ...                          realtime_end='9999-12-31')
     
     Args:
         series_id: FRED series code (like 'UNRATE' for unemployment)
         start_date: Start date for data (YYYY-MM-DD format)
+        session: Optional requests session to reuse pooled connections
+        realtime_start, realtime_end: Vintage window (ALFRED). When either
+            is given every version of every observation valid in the
+            window is returned instead of today's values.
     
     Returns:
-        Time series of values with dates as index
+        Time series of values with dates as index. On success the FRED
+        vintage (realtime_start) is stored in series.attrs['vintage'].
+        For a vintage window, a DataFrame from fetch_vintages().
+
+    Concurrent calls for the same series and window share one request:
+    the first caller fetches and the others wait for its result.
+    """
+    key = (series_id, str(start_date), realtime_start, realtime_end)
+    with _IN_FLIGHT_LOCK:
+        pending = _IN_FLIGHT.get(key)
+        if pending is None:
+            pending = _IN_FLIGHT[key] = Future()
+            leader = True
+        else:
+            leader = False
+
+    if not leader:
+        return pending.result().copy()
+
+    try:
+        if realtime_start is None and realtime_end is None:
+            series = fetch_series(series_id, start_date, session)
+        else:
+            series = fetch_vintages(series_id, start_date,
+                                    realtime_start or '1776-07-04',
+                                    realtime_end or '9999-12-31', session)
+        pending.set_result(series)
+        return series
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        with _IN_FLIGHT_LOCK:
+            del _IN_FLIGHT[key]
+
+def fetch_series(series_id, start_date=START_DATE, session=None):
+    """
+    Fetch one series with timeouts, rate limiting and retries
+
+    Returns an empty Series if FRED still fails after MAX_RETRIES.
     """
     # Set up API call
     url = f"{BASE_URL}/series/observations"
     params = {
         'series_id': series_id,
-        'api_key': API_KEY,
+        'api_key': get_api_key(),
         'file_type': 'json',
         'observation_start': start_date
     }
+    http = session if session is not None else requests
+    attempts = 0
 
-    try:
+    def fetch_once():
+        nonlocal attempts
+        attempts += 1
         # Get data from FRED
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        with span('http', series_id=series_id):
+            response = http.get(url, params=params, stream=True,
+                                timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        with span('parse', series_id=series_id):
+            return response, parse_observations(response.iter_content(CHUNK_SIZE))
 
-        # Convert to pandas series with date index
-        df = pd.DataFrame(data['observations'])
-        df['date'] = pd.to_datetime(df['date'])
-        df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    with span('fetch', series_id=series_id, start_date=str(start_date)) as fetch:
+        try:
+            response, (dates, values, header) = with_retries(fetch_once, series_id)
 
-        return df.set_index('date')['value']
+            # Convert to pandas series with date index
+            index = pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='date')
+            series = pd.Series(values, index=index, name='value')
+            series.attrs['vintage'] = header.get('realtime_start')
+            fetch.set(bytes=response.raw.tell(), rows=len(series), attempts=attempts)
+            return series
 
-    except requests.exceptions.RequestException as e:
-        print(f"Couldn't get data for {series_id}. Error: {e}")
-        return pd.Series()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Couldn't get data for {series_id} after {attempts} attempt(s). "
+                  f"Error: {redact(e)}")
+            fetch.set(error=redact(e), attempts=attempts)
+            return pd.Series()
 
-def fred_load():
+# Observations per request when paging through vintages (FRED's maximum)
+VINTAGE_PAGE_SIZE = 100_000
+
+def fetch_vintages(series_id, start_date=START_DATE, realtime_start='1776-07-04',
+                   realtime_end='9999-12-31', session=None):
     """
-    Get all economic indicators in one DataFrame
+    Fetch every version of a series' observations within a vintage window
+
+    Pages through FRED's real-time output (one row per observation and
+    period it was valid for) with the same timeouts, rate limiting and
+    retries as fetch_series.
+
+    Returns:
+        DataFrame with date, value, realtime_start and realtime_end
+        columns (realtime_end is inclusive; 9999-12-31 means still
+        current). On success the requested window is stored in
+        attrs['vintage_window']; if FRED still fails after MAX_RETRIES the
+        frame is empty and has no 'vintage_window'.
+    """
+    url = f"{BASE_URL}/series/observations"
+    http = session if session is not None else requests
+    pages = []
+    offset = 0
+    attempts = 0
+
+    with span('fetch_vintages', series_id=series_id,
+              realtime_start=str(realtime_start)) as fetch:
+        try:
+            while True:
+                params = {
+                    'series_id': series_id,
+                    'api_key': get_api_key(),
+                    'file_type': 'json',
+                    'observation_start': start_date,
+                    'realtime_start': realtime_start,
+                    'realtime_end': realtime_end,
+                    'limit': VINTAGE_PAGE_SIZE,
+                    'offset': offset,
+                }
+
+                def fetch_once():
+                    nonlocal attempts
+                    attempts += 1
+                    with span('http', series_id=series_id, offset=offset):
+                        response = http.get(url, params=params, stream=True,
+                                            timeout=REQUEST_TIMEOUT)
+                        response.raise_for_status()
+                    with span('parse', series_id=series_id):
+                        return parse_observations(response.iter_content(CHUNK_SIZE),
+                                                  realtime=True)
+
+                dates, values, header, starts, ends = with_retries(fetch_once,
+                                                                   series_id)
+                pages.append((dates, values, starts, ends))
+                offset += len(dates)
+                if not len(dates) or offset >= header.get('count', 0):
+                    break
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Couldn't get vintages for {series_id} after {attempts} attempt(s). "
+                  f"Error: {redact(e)}")
+            fetch.set(error=redact(e), attempts=attempts)
+            return pd.DataFrame(
+                columns=['date', 'value', 'realtime_start', 'realtime_end'])
+
+        names = ['date', 'value', 'realtime_start', 'realtime_end']
+        columns = [np.concatenate(parts) for parts in zip(*pages)]
+        vintages = pd.DataFrame(dict(zip(names, columns)))
+        vintages.attrs['vintage_window'] = (str(realtime_start), str(realtime_end))
+        fetch.set(rows=len(vintages), attempts=attempts, pages=len(pages))
+        return vintages
+
+def load_series(series_id, start_date=START_DATE, session=None, cache_dir=CACHE_DIR):
+    """
+    Get one series through the local cache, fetching only the delta
+
+    Example:
+    >>> dff = load_series('DFF')
+
+    The first call downloads the full history from start_date. Later calls
+    request observations from (last cached date - REVISION_WINDOW_DAYS)
+    onward and overwrite that tail, so revisions inside the window land.
+    If FRED can't be reached the cached copy is returned unchanged.
+    """
+    start_date = pd.Timestamp(start_date)
+    cached, meta = read_cache(series_id, cache_dir)
+
+    # Full fetch when nothing usable is cached
+    if cached is None or pd.Timestamp(meta['start_date']) > start_date:
+        series = get_fred_data(series_id, start_date.strftime('%Y-%m-%d'), session)
+        if 'vintage' in series.attrs:
+            write_cache(series_id, series, start_date, series.attrs['vintage'],
+                        cache_dir)
+        return series
+
+    # Serve straight from the cache while it is younger than the max age
+    if cache_age_hours(meta) >= CACHE_MAX_AGE_HOURS:
+        fresh_start = pd.Timestamp(meta['start_date'])
+        if meta['last_observation'] is not None:
+            window_start = (pd.Timestamp(meta['last_observation'])
+                            - pd.Timedelta(days=REVISION_WINDOW_DAYS))
+            fresh_start = max(window_start, fresh_start)
+
+        fresh = get_fred_data(series_id, fresh_start.strftime('%Y-%m-%d'), session)
+        if 'vintage' in fresh.attrs:
+            # Replace the revision window with what FRED reports now
+            cached = pd.concat([cached[cached.index < fresh_start], fresh])
+            write_cache(series_id, cached, meta['start_date'], fresh.attrs['vintage'],
+                        cache_dir)
+
+    return cached[cached.index >= start_date]
+
+def fred_load_series(max_workers=MAX_WORKERS, use_cache=True, indicators=INDICATORS):
+    """
+    Get every indicator at its native frequency
+
+    Series are fetched concurrently on a bounded thread pool that shares one
+    HTTP session. max_workers caps the number of in-flight requests. With
+    use_cache, each series is served from the local cache and only the
+    observations published since the last run are requested.
+
+    indicators defaults to fred_config.INDICATORS; any mapping of the same
+    shape works, such as a subset of a fred_catalog catalog.
+
+    Returns:
+        Dict of indicator name -> Series, in config order
     """
-    # Load each indicator using config
-    data = {}
-    for name, info in INDICATORS.items():
-        data[name] = get_fred_data(info['id'])
+    fetch = load_series if use_cache else get_fred_data
+    return map_series(lambda session, name, info: fetch(info['id'], session=session),
+                      indicators, max_workers)
 
-    return pd.DataFrame(data)
+def map_series(fetch, entries, max_workers=MAX_WORKERS):
+    """
+    Call fetch(session, key, entry) for every entry on a bounded thread pool
+
+    Example:
+    >>> def count(session, key, entry):
+    ...     return len(get_fred_data(entry['id'], session=session))
+    >>> counts = map_series(count, INDICATORS)
+
+    Workers share one keep-alive session, and each call runs in a copy of
+    the caller's context so its spans nest under the caller's span.
+
+    Returns:
+        Dict of key -> fetch result, in entry order
+    """
+    with create_session(max_workers) as session:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {key: pool.submit(contextvars.copy_context().run, fetch, session,
+                                        key, entry)
+                       for key, entry in entries.items()}
+            # Collect in entry order so column layouts match the config
+            return {key: future.result() for key, future in futures.items()}
+
+# Resample rules for each alignment target, finest first
+ALIGN_RULES = {'D': 'D', 'M': 'MS', 'Q': 'QS', 'Y': 'YS'}
+
+def align_series(series, freq=None, indicators=INDICATORS):
+    """
+    Materialize native-frequency series as one frame at a target frequency
+
+    Example:
+    >>> monthly = align_series(fred_load_series(), freq='M')
+
+    Series finer than freq are aggregated with their indicator's 'agg' rule
+    (mean, last, ...). Coarser series are forward-filled from each
+    observation until the next one, and the newest observation through
+    the end of its period (a Q3 value covers July to September). Rows are
+    labelled by period start, the way FRED dates monthly and quarterly
+    observations.
+
+    Args:
+        series: Dict of indicator name -> native Series
+        freq: 'D', 'M', 'Q' or 'Y'; None keeps the raw outer join on every
+            observation date
+        indicators: Indicator definitions with 'frequency' and 'agg'
+
+    Returns:
+        DataFrame with one column per indicator
+    """
+    if freq is None:
+        return pd.DataFrame(series)
+
+    rank = list(ALIGN_RULES)
+    rule = ALIGN_RULES[freq]
+    columns = {}
+    for name, values in series.items():
+        native = indicators[name].get('frequency', 'D')
+        if values.empty:
+            columns[name] = values
+        elif rank.index(native) <= rank.index(freq):
+            # Same or finer than the target: aggregate down. Grouping on
+            # periods gives resample(rule)'s bins without building them
+            # timestamp by timestamp, which dominates for many short series.
+            periods = values.index.to_period(freq)
+            agg = indicators[name].get('agg', 'mean')
+            aggregated = values.groupby(periods).agg(agg)
+            bins = pd.period_range(periods.min(), periods.max(), freq=freq)
+            columns[name] = aggregated.reindex(bins).to_timestamp()
+        else:
+            # Coarser than the target: carry each observation forward, through
+            # the end of the last observation's own period
+            filled = values.resample(rule).ffill()
+            last = values.index.max().to_period(native).end_time.to_period(freq)
+            bins = pd.period_range(filled.index.min().to_period(freq), last, freq=freq)
+            columns[name] = filled.reindex(bins.to_timestamp(), method='ffill')
+
+    return pd.DataFrame(columns)
+
+def fred_load(max_workers=MAX_WORKERS, use_cache=True, freq=None,
+              indicators=INDICATORS):
+    """
+    Get all economic indicators in one DataFrame
+
+    With freq=None every observation date is a row (a mostly empty daily
+    outer join, as fill_missing_values expects). Pass 'D', 'M', 'Q' or 'Y'
+    to align each indicator to that frequency with align_series instead.
+    """
+    with span('fred_load', freq=freq) as load:
+        series = fred_load_series(max_workers, use_cache, indicators)
+        df = align_series(series, freq, indicators)
+        load.set(rows=len(df), columns=df.shape[1])
+    return df
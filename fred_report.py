@@ -0,0 +1,148 @@
+# File for generating many report variants in one run
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from fred_loader import fred_load
+from fred_stats import fit_regression_grid
+from fred_transformer import classify_periods, fred_transform
+from fred_visualizer import (
+    create_stats_table,
+    fred_export,
+    plot_regime_relationship,
+    plot_time_series,
+    prepare_viz_data,
+)
+
+# Defaults for every report spec; a spec only lists what it changes
+DEFAULT_SPEC = {
+    'name': 'fred_analysis',
+    'title': 'FRED Economic Analysis',
+    'start_date': '1996-12-31',
+    'regimes': None,
+    'x': 'quarterly_spread',
+    'y': 'loan_delinq_12m_forward',
+    'base_column': None,
+    'pages': [
+        {'regime': 'Pre-GFC (1996-2007)',
+         'title': ('Pre-2008 Credit Risk Dynamics: '
+                   'OAS as Leading Indicator of Delinquency Rates'),
+         'subtitle': 'Strong Predictive Relationship (r = {correlation:.3f})'},
+        {'regime': 'Covid to Present (2020-2024)',
+         'title': ('Credit Risk Dynamics: '
+                   'OAS as Leading Indicator of Delinquency Rates (2020-2024)'),
+         'subtitle': (' Correlation Analysis Shows Weakened Predictive Relationship '
+                      '(r = {correlation:.3f})')},
+    ],
+}
+
+# Transformed history shared by every spec in a worker process
+_SHARED_DF = None
+
+def _init_worker(df):
+    global _SHARED_DF
+    _SHARED_DF = df
+
+def build_report(spec, output_dir):
+    """
+    Build the figures and PDF for one report spec from the shared frame
+
+    spec['pages'] holds the two scatter pages: the first is drawn at the
+    top of page two, the second below it. A page whose regime has no rows
+    in the spec's window fails the report with a ValueError naming it.
+
+    Returns:
+        Manifest entry with the output file, timings and any error
+    """
+    spec = {**DEFAULT_SPEC, **spec}
+    filename = os.path.join(output_dir, f"{spec['name']}.pdf")
+    entry = {'name': spec['name'], 'filename': filename,
+             'start_date': spec['start_date']}
+
+    try:
+        started = time.perf_counter()
+        df = prepare_viz_data(_SHARED_DF, spec['start_date'])
+        if spec['regimes'] is not None:
+            df = classify_periods(df, spec['regimes'])
+        present = set(df['economic_period'].dropna())
+        missing = [page['regime'] for page in spec['pages']
+                   if page['regime'] not in present]
+        if missing:
+            raise ValueError(f"No rows for regime(s) {missing} from "
+                             f"{spec['start_date']}")
+
+        stats_table = create_stats_table(df)
+        grid = fit_regression_grid(df, [spec['x']], [spec['y']])
+        scatter_plots = [
+            plot_regime_relationship(df, page['regime'], page['title'],
+                                     page['subtitle'], x=spec['x'], y=spec['y'],
+                                     base_column=spec['base_column'], grid=grid)
+            for page in spec['pages']
+        ]
+        time_series_plot = plot_time_series(df)
+        entry['figures_seconds'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # One Kaleido renderer per worker; the pool already uses every CPU
+        fred_export(stats_table, scatter_plots[1], scatter_plots[0], time_series_plot,
+                    filename=filename, title=spec['title'], max_workers=1)
+        entry['pdf_seconds'] = time.perf_counter() - started
+        entry['status'] = 'ok'
+
+    except Exception as e:
+        print(f"Couldn't build report {spec['name']}. Error: {e}")
+        entry['status'] = 'error'
+        entry['error'] = str(e)
+
+    return entry
+
+def fred_report_batch(specs, output_dir='reports', df=None, max_workers=None):
+    """
+    Generate one PDF per report spec plus a manifest of timings
+
+    Example:
+    >>> fred_report_batch([{'name': 'since_2000', 'start_date': '2000-01-01'},
+    ...                    {'name': 'late_covid', 'regimes': custom_regimes}])
+
+    Data is loaded and transformed once, from the earliest start date in
+    any spec, and handed to each worker process once at startup. Figure
+    building and PDF assembly for the specs run on the process pool.
+
+    Args:
+        specs: List of dicts overriding DEFAULT_SPEC keys
+        output_dir: Directory for the PDFs and manifest.json
+        df: Raw indicator frame; fetched with fred_load() when omitted
+        max_workers: Process pool size (defaults to the CPU count)
+
+    Returns:
+        Manifest dict, also written to output_dir/manifest.json
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'started_at': pd.Timestamp.now().isoformat(timespec='seconds')}
+
+    started = time.perf_counter()
+    if df is None:
+        df = fred_load()
+    manifest['load_seconds'] = time.perf_counter() - started
+
+    # Transform the widest window once; each spec slices it
+    started = time.perf_counter()
+    start_date = min(pd.Timestamp({**DEFAULT_SPEC, **spec}['start_date'])
+                     for spec in specs)
+    shared = fred_transform(df, start_date)
+    manifest['transform_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(shared,)) as pool:
+        futures = [pool.submit(build_report, spec, output_dir) for spec in specs]
+        manifest['reports'] = [future.result() for future in futures]
+    manifest['reports_seconds'] = time.perf_counter() - started
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
@@ -0,0 +1,284 @@
+# File for statistical summaries used by tables and figures
+import numpy as np
+import pandas as pd
+
+
+def grouped_sums(terms, codes, groups):
+    """
+    Sum each per-row term within each group in one grouped pass
+
+    Returns:
+        Array of shape (terms, groups)
+    """
+    sums = pd.DataFrame(np.column_stack(terms).astype('float64')).groupby(codes).sum()
+    return sums.reindex(range(groups), fill_value=0.0).to_numpy().T
+
+def centred(values):
+    """
+    Values minus their mean over non-missing entries, and the non-missing mask
+
+    Centring before summing squares and cross products keeps the prefix-sum
+    differences used for windows and regimes well conditioned.
+    """
+    values = np.asarray(values, dtype='float64')
+    valid = ~np.isnan(values)
+    return values - (values[valid].mean() if valid.any() else 0.0), valid
+
+def correlation_from_sums(n, sx, sy, sxx, syy, sxy, min_count=2):
+    """
+    Pearson r from pairwise-complete sufficient statistics (arrays of any
+    shape), NaN where fewer than min_count rows or either side is constant
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+        # Treat near-zero variance (lost to cancellation) as constant
+        usable = ((n >= max(min_count, 2))
+                  & (var_x > 1e-12 * sxx) & (var_y > 1e-12 * syy))
+    return np.where(usable, r, np.nan)
+
+def compute_regime_stats(df, columns, base_column, targets,
+                         regime_column='economic_period'):
+    """
+    Compute per-regime means, stds and correlations in one grouped pass
+
+    Example:
+    >>> stats = compute_regime_stats(df, ['option_adjusted_spread'],
+    ...                              'option_adjusted_spread',
+    ...                              ['loan_delinq_12m_forward'])
+
+    Every statistic is derived from grouped sufficient statistics (counts,
+    sums, sums of squares and cross products), so the frame is grouped once
+    regardless of how many columns or targets are requested. Correlations
+    use pairwise-complete rows like pandas' Series.corr, and r² is derived
+    from r rather than recomputed.
+
+    Args:
+        df: Frame with a regime label column
+        columns: Columns to summarize with mean and std
+        base_column: Column correlated against every target
+        targets: Columns to correlate with base_column
+        regime_column: Column holding the regime labels
+
+    Returns:
+        Tidy DataFrame with regime, stat, column, base_column and value.
+        Regimes keep their order of appearance in df.
+    """
+    columns = [column for column in columns if column in df.columns]
+    targets = [target for target in targets
+               if target in df.columns and base_column in df.columns]
+
+    codes, regimes = pd.factorize(df[regime_column])
+    rows = codes >= 0
+    codes = codes[rows]
+
+    # Stack every per-row term that needs summing into one block
+    terms = []
+    for column in columns:
+        values = df[column].to_numpy(dtype='float64')[rows]
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+        terms.extend([valid, values, values * values])
+
+    if targets:
+        x_all = df[base_column].to_numpy(dtype='float64')[rows]
+    for target in targets:
+        y = df[target].to_numpy(dtype='float64')[rows]
+        valid = ~np.isnan(x_all) & ~np.isnan(y)
+        x = np.where(valid, x_all, 0.0)
+        y = np.where(valid, y, 0.0)
+        terms.extend([valid, x, y, x * x, y * y, x * y])
+
+    if not terms:
+        return pd.DataFrame(
+            columns=['regime', 'stat', 'column', 'base_column', 'value'])
+
+    sums = grouped_sums(terms, codes, len(regimes))
+
+    results = []
+
+    def add(stat, column, base, values):
+        for regime, value in zip(regimes, values):
+            results.append({'regime': regime, 'stat': stat, 'column': column,
+                            'base_column': base, 'value': value})
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = 0
+        for column in columns:
+            n, total, total_sq = sums[position:position + 3]
+            position += 3
+            mean = total / n
+            std = np.sqrt(np.maximum(total_sq - total * mean, 0.0) / (n - 1))
+            add('mean', column, None, np.where(n > 0, mean, np.nan))
+            add('std', column, None, np.where(n > 1, std, np.nan))
+
+        for target in targets:
+            r = correlation_from_sums(*sums[position:position + 6])
+            position += 6
+            add('r', target, base_column, r)
+            add('r2', target, base_column, r ** 2)
+
+    return pd.DataFrame(results)
+
+def compute_rolling_correlation(df, base_columns, targets, window=None, min_periods=30):
+    """
+    Compute rolling or expanding correlations and R² for every base/target pair
+
+    Example:
+    >>> rolling = compute_rolling_correlation(df, ['option_adjusted_spread'],
+    ...                                       ['loan_delinq_3m_forward',
+    ...                                        'loan_delinq_12m_forward'],
+    ...                                       window='730D')
+    >>> rolling['r']['option_adjusted_spread']['loan_delinq_12m_forward']
+
+    Each pair is reduced to prefix sums of its sufficient statistics
+    (count, sums, squares and cross products over pairwise-complete rows),
+    so every window is the difference of two prefix sums: one O(n) pass
+    per pair whatever the window length. Columns are centred on their
+    overall mean first to keep the differences well conditioned.
+
+    Args:
+        df: Frame with a sorted date index
+        base_columns: Indicators correlated against every target
+        targets: Horizon columns such as 'loan_delinq_12m_forward'
+        window: None for an expanding window, an int for a fixed number of
+            rows, or an offset such as '730D' for a calendar window
+        min_periods: Fewest pairwise-complete rows before a value is reported
+
+    Returns:
+        DataFrame on df's index with (stat, base_column, column) columns,
+        where stat is 'r', 'r2' or 'n'
+    """
+    base_columns = [column for column in base_columns if column in df.columns]
+    targets = [target for target in targets if target in df.columns]
+    length = len(df)
+    ends = np.arange(1, length + 1)
+
+    # Row just past each window's start, in prefix-sum coordinates
+    if window is None:
+        starts = np.zeros(length, dtype='int64')
+    elif isinstance(window, (int, np.integer)):
+        starts = np.maximum(ends - window, 0)
+    else:
+        dates = df.index.to_numpy()
+        starts = np.searchsorted(dates, dates - pd.Timedelta(window), side='right')
+
+    def windowed(values):
+        prefix = np.concatenate([[0.0], np.cumsum(values)])
+        return prefix[ends] - prefix[starts]
+
+    columns = {}
+    for base in base_columns:
+        x_all, x_valid = centred(df[base])
+        for target in targets:
+            y_all, y_valid = centred(df[target])
+            valid = x_valid & y_valid
+            x = np.where(valid, x_all, 0.0)
+            y = np.where(valid, y_all, 0.0)
+
+            n = windowed(valid.astype('float64'))
+            sx, sy = windowed(x), windowed(y)
+            sxx, syy, sxy = windowed(x * x), windowed(y * y), windowed(x * y)
+            r = correlation_from_sums(n, sx, sy, sxx, syy, sxy, min_periods)
+
+            columns[('r', base, target)] = r
+            columns[('r2', base, target)] = r ** 2
+            columns[('n', base, target)] = n
+
+    result = pd.DataFrame(columns, index=df.index)
+    result.columns = pd.MultiIndex.from_tuples(result.columns,
+                                               names=['stat', 'base_column', 'column'])
+    return result
+
+def fit_regression_grid(df, predictors, targets, lags=(0,),
+                        regime_column='economic_period'):
+    """
+    Fit y = intercept + slope * x for every regime, predictor, lag and target at once
+
+    Example:
+    >>> grid = fit_regression_grid(df, ['quarterly_spread', 'option_adjusted_spread'],
+    ...                            [c for c in df.columns
+    ...                             if c.startswith('loan_delinq_')],
+    ...                            lags=range(0, 366, 30))
+    >>> grid.sort_values('r2', ascending=False).head()
+
+    Every combination is a single-predictor least-squares fit, so it is
+    solved in closed form from grouped sufficient statistics: the frame is
+    grouped once and all fits come out of the same arrays. Rows are
+    pairwise complete per combination, as in Series.corr, so r² matches
+    the squared correlation of the plotted points.
+
+    Args:
+        df: Frame with a regime label column
+        predictors: Candidate leading indicators (x)
+        targets: Forward delinquency horizons (y)
+        lags: Rows to lag each predictor by (negative values lead)
+        regime_column: Column holding the regime labels
+
+    Returns:
+        DataFrame with one row per regime, predictor, lag and target holding
+        n, slope, intercept, r, r2, slope_se and intercept_se
+    """
+    predictors = [column for column in predictors if column in df.columns]
+    targets = [target for target in targets if target in df.columns]
+
+    codes, regimes = pd.factorize(df[regime_column])
+    rows = codes >= 0
+    codes = codes[rows]
+
+    terms = []
+    combos = []
+    for predictor in predictors:
+        series = df[predictor]
+        for lag in lags:
+            x_all = series.shift(lag).to_numpy(dtype='float64')[rows]
+            for target in targets:
+                y = df[target].to_numpy(dtype='float64')[rows]
+                valid = ~np.isnan(x_all) & ~np.isnan(y)
+                x = np.where(valid, x_all, 0.0)
+                y = np.where(valid, y, 0.0)
+                terms.extend([valid, x, y, x * x, y * y, x * y])
+                combos.append((predictor, lag, target))
+
+    columns = ['regime', 'predictor', 'lag', 'target', 'n', 'slope', 'intercept',
+               'r', 'r2', 'slope_se', 'intercept_se']
+    if not terms:
+        return pd.DataFrame(columns=columns)
+
+    # (combos, 6 statistics, regimes)
+    sums = grouped_sums(terms, codes, len(regimes))
+    sums = sums.reshape(len(combos), 6, len(regimes))
+    n, sx, sy, sxx, syy, sxy = (sums[:, i, :] for i in range(6))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = sx / n
+        mean_y = sy / n
+        ss_x = sxx - sx * mean_x
+        ss_y = syy - sy * mean_y
+        ss_xy = sxy - sx * mean_y
+        usable = (n > 2) & (ss_x > 1e-12 * sxx)
+
+        slope = ss_xy / ss_x
+        intercept = mean_y - slope * mean_x
+        r = np.clip(ss_xy / np.sqrt(ss_x * ss_y), -1.0, 1.0)
+        r = np.where(ss_y > 1e-12 * syy, r, np.nan)
+        residual_var = np.maximum(ss_y - slope * ss_xy, 0.0) / (n - 2)
+        slope_se = np.sqrt(residual_var / ss_x)
+        intercept_se = np.sqrt(residual_var * (1.0 / n + mean_x * mean_x / ss_x))
+
+    stats = {name: np.where(usable, values, np.nan).ravel()
+             for name, values in [('slope', slope), ('intercept', intercept),
+                                  ('r', r), ('slope_se', slope_se),
+                                  ('intercept_se', intercept_se)]}
+    grid = pd.DataFrame({
+        'regime': np.tile(np.asarray(regimes, dtype=object), len(combos)),
+        'predictor': np.repeat([combo[0] for combo in combos], len(regimes)),
+        'lag': np.repeat([combo[1] for combo in combos], len(regimes)),
+        'target': np.repeat([combo[2] for combo in combos], len(regimes)),
+        'n': n.ravel().astype('int64'),
+        **stats,
+    })
+    grid['r2'] = grid['r'] ** 2
+    return grid[columns]
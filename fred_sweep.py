@@ -0,0 +1,203 @@
+# File for sensitivity sweeps over regime boundaries and forward horizons
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fred_config import REGIMES
+from fred_stats import centred, correlation_from_sums
+from fred_trace import span
+from fred_transformer import FORWARD_INTERVALS, create_forward_metrics
+
+# Statistics reported for every scenario, regime, base column and horizon
+SWEEP_STATS = ['n', 'r', 'r2']
+
+# Scenarios evaluated per block; bounds memory at about
+# SWEEP_CHUNK_SIZE * regimes * pairs * 6 floats per block
+SWEEP_CHUNK_SIZE = 20_000
+
+# Grids at least this large are spread over a process pool; smaller ones are
+# faster in-process than the cost of starting workers
+SWEEP_PARALLEL_MIN = 200_000
+
+# Prefix sums shared by every chunk in a worker process
+_SHARED_PREFIX = None
+
+def _init_worker(prefix):
+    global _SHARED_PREFIX
+    _SHARED_PREFIX = prefix
+
+def boundary_grid(boundaries):
+    """
+    Every strictly increasing combination of candidate regime cut dates
+
+    Example:
+    >>> cuts = boundary_grid([pd.date_range('2007-01-01', '2008-06-01', freq='MS'),
+    ...                       ['2009-03-31', '2009-06-30', '2009-12-31'],
+    ...                       '2020-01-01'])
+
+    Args:
+        boundaries: One entry per cut: a single date or a list of candidates
+
+    Returns:
+        datetime64[ns] array of shape (scenarios, cuts)
+    """
+    candidates = [
+        pd.DatetimeIndex([cut] if isinstance(cut, (str, pd.Timestamp)) else cut).asi8
+        for cut in boundaries
+    ]
+    mesh = np.meshgrid(*candidates, indexing='ij')
+    cuts = np.stack([axis.ravel() for axis in mesh], axis=1)
+    increasing = np.all(np.diff(cuts, axis=1) > 0, axis=1)
+    return cuts[increasing].astype('datetime64[ns]')
+
+def horizon_targets(df, horizons, metric_column='delinquency_rate_loans',
+                    prefix='loan_delinq'):
+    """
+    Forward-metric columns for each horizon, reusing those already in df
+
+    Horizons fred_transform did not build are derived from metric_column
+    with create_forward_metrics on a copy of that one column.
+
+    Returns:
+        List of column names and a frame holding them, in horizon order
+    """
+    columns = [f'{prefix}_{months}m_forward' for months in horizons]
+    targets = df[[column for column in columns if column in df.columns]]
+    missing = [months for months, column in zip(horizons, columns)
+               if column not in df.columns]
+    if missing:
+        built = create_forward_metrics(df[[metric_column]].copy(), metric_column,
+                                       prefix, missing)
+        targets = pd.concat([targets, built.drop(columns=metric_column)], axis=1)
+    return columns, targets[columns]
+
+def sweep_prefix_sums(df, base_columns, targets):
+    """
+    Prefix sums of the correlation sufficient statistics of every pair
+
+    Each base column and target is centred on its overall mean and reduced
+    to pairwise-complete count, sums, squares and cross products, so the
+    statistics of any row range [a, b) are prefix[..., b] - prefix[..., a].
+
+    Returns:
+        Array of shape (base_columns, targets, 6, rows + 1)
+    """
+    prefix = np.zeros((len(base_columns), targets.shape[1], 6, len(df) + 1))
+    ys = [centred(targets[column]) for column in targets.columns]
+    for i, base in enumerate(base_columns):
+        x_all, x_valid = centred(df[base])
+        for j, (y_all, y_valid) in enumerate(ys):
+            valid = x_valid & y_valid
+            x = np.where(valid, x_all, 0.0)
+            y = np.where(valid, y_all, 0.0)
+            terms = np.stack([valid.astype('float64'), x, y, x * x, y * y, x * y])
+            np.cumsum(terms, axis=1, out=prefix[i, j, :, 1:])
+    return prefix
+
+def sweep_chunk(edges, prefix=None):
+    """
+    Correlation statistics for a block of scenarios
+
+    Args:
+        edges: Row positions of shape (scenarios, regimes + 1); regime k of
+            a scenario covers rows edges[k] to edges[k + 1]
+        prefix: Output of sweep_prefix_sums (the worker's shared copy when
+            omitted)
+
+    Returns:
+        Array of shape (scenarios, regimes, len(SWEEP_STATS), base_columns, targets)
+    """
+    prefix = _SHARED_PREFIX if prefix is None else prefix
+    # (base_columns, targets, 6, scenarios, regimes)
+    sums = prefix[..., edges[:, 1:]] - prefix[..., edges[:, :-1]]
+    n = sums[:, :, 0]
+    r = correlation_from_sums(*(sums[:, :, i] for i in range(6)))
+
+    # -> (scenarios, regimes, stats, base_columns, targets)
+    return np.stack([n, r, r * r]).transpose(3, 4, 0, 1, 2)
+
+def fred_sweep(df, boundaries, horizons=FORWARD_INTERVALS,
+               base_columns=('option_adjusted_spread',),
+               metric_column='delinquency_rate_loans', prefix='loan_delinq',
+               labels=None, max_workers=None):
+    """
+    Correlations and R² for every combination of regime cut dates and horizons
+
+    Example:
+    >>> cube = fred_sweep(df, [pd.date_range('2007-01-01', '2008-06-01', freq='MS'),
+    ...                        pd.date_range('2009-01-01', '2010-06-01', freq='MS'),
+    ...                        pd.date_range('2019-07-01', '2020-06-01', freq='MS')])
+    >>> covid = cube.xs('Covid to Present (2020-2024)', level='regime')
+    >>> covid = covid['r']['option_adjusted_spread']
+    >>> covid.groupby(level='cut_3').agg(['min', 'max'])  # sensitivity to the Covid cut
+
+    The frame is reduced once to prefix sums of each base/horizon pair's
+    sufficient statistics; a scenario's regimes are then row ranges found
+    with one searchsorted, and each statistic is the difference of two
+    prefix sums. Nothing is re-transformed per scenario, and blocks of
+    scenarios are evaluated as whole arrays. Grids of SWEEP_PARALLEL_MIN
+    scenarios or more run across a process pool.
+
+    Args:
+        df: Transformed frame with a sorted date index (fred_transform)
+        boundaries: One entry per regime cut, each a date or a list of
+            candidate dates (see boundary_grid); cuts split df into
+            len(boundaries) + 1 regimes as in classify_periods
+        horizons: Forward horizons in months
+        base_columns: Indicators correlated against every horizon
+        metric_column, prefix: Source and names of the forward columns
+        labels: Regime names (REGIMES labels when the counts match)
+        max_workers: Process pool size for large grids (defaults to the CPU
+            count); 1 always runs in-process
+
+    Returns:
+        DataFrame cube indexed by (cut_1 .. cut_k, regime) with
+        (stat, base_column, horizon) columns, stat being 'n', 'r' or 'r2'
+    """
+    base_columns = [column for column in base_columns if column in df.columns]
+    cuts = boundary_grid(boundaries)
+    segments = cuts.shape[1] + 1
+    if labels is None:
+        labels = ([regime['label'] for regime in REGIMES] if len(REGIMES) == segments
+                  else [f'regime_{k + 1}' for k in range(segments)])
+    if len(labels) != segments:
+        raise ValueError(
+            f"{segments} regimes need {segments} labels, got {len(labels)}")
+
+    with span('fred_sweep', scenarios=len(cuts), horizons=len(horizons)) as sweep:
+        columns, targets = horizon_targets(df, list(horizons), metric_column, prefix)
+        prefix_sums = sweep_prefix_sums(df, base_columns, targets)
+
+        # Regime k of each scenario covers rows edges[k]..edges[k + 1]
+        dates = df.index.to_numpy()
+        positions = np.searchsorted(dates, cuts.ravel(), side='left')
+        positions = positions.reshape(cuts.shape)
+        edges = np.column_stack([np.zeros(len(cuts), dtype='int64'), positions,
+                                 np.full(len(cuts), len(df), dtype='int64')])
+        chunks = [edges[i:i + SWEEP_CHUNK_SIZE]
+                  for i in range(0, len(edges), SWEEP_CHUNK_SIZE)]
+
+        parallel = (len(cuts) >= SWEEP_PARALLEL_MIN and max_workers != 1
+                    and (os.cpu_count() or 1) > 1)
+        sweep.set(parallel=parallel)
+        if parallel:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(prefix_sums,)) as pool:
+                blocks = list(pool.map(sweep_chunk, chunks))
+        else:
+            blocks = [sweep_chunk(chunk, prefix_sums) for chunk in chunks]
+        cube = (np.concatenate(blocks) if blocks
+                else np.empty((0, segments, len(SWEEP_STATS), len(base_columns),
+                               len(columns))))
+
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(cuts[:, k], segments) for k in range(cuts.shape[1])]
+        + [np.tile(np.asarray(labels, dtype=object), len(cuts))],
+        names=[f'cut_{k + 1}' for k in range(cuts.shape[1])] + ['regime'])
+    result_columns = pd.MultiIndex.from_product(
+        [SWEEP_STATS, base_columns, list(horizons)],
+        names=['stat', 'base_column', 'horizon'])
+    return pd.DataFrame(cube.reshape(len(cuts) * segments, -1), index=index,
+                        columns=result_columns)
@@ -0,0 +1,183 @@
+# File for opt-in timing instrumentation
+import contextvars
+import functools
+import json
+import logging
+import re
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is skipped
+    resource = None
+
+# Active sinks; tracing is off while this is empty
+_SINKS = []
+# Name of the enclosing span in the current thread/context
+_PARENT = contextvars.ContextVar('fred_trace_parent', default=None)
+
+# Query parameters whose values never reach a sink or the console; requests
+# puts the full URL, key included, in the text of its HTTP errors
+REDACTED_PARAMS = ('api_key',)
+_REDACTED = re.compile(rf"\b({'|'.join(REDACTED_PARAMS)})=[^&\s'\")]+")
+
+
+class MemorySink:
+    """
+    Keep span records in a list (handy in tests and notebooks)
+    """
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+class LogSink:
+    """
+    Send one log line per span through the standard logging module
+    """
+    def __init__(self, logger='fred', level=logging.INFO):
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = level
+
+    def emit(self, record):
+        extras = ' '.join(f"{key}={value}" for key, value in record.items()
+                          if key not in ('name', 'seconds', 'start'))
+        self.logger.log(self.level, "%s %.4fs %s", record['name'], record['seconds'],
+                        extras)
+
+class JsonLinesSink:
+    """
+    Append one JSON object per span to a file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+def enable_tracing(*sinks):
+    """
+    Start sending spans to the given sinks
+
+    Example:
+    >>> sink = MemorySink()
+    >>> enable_tracing(sink, JsonLinesSink('trace.jsonl'))
+    """
+    _SINKS[:] = sinks
+
+def disable_tracing():
+    """
+    Stop tracing; spans go back to being no-ops
+    """
+    _SINKS.clear()
+
+def tracing_enabled():
+    return bool(_SINKS)
+
+def redact(text):
+    """
+    text (or an exception's message) with secret query parameters masked
+
+    Example:
+    >>> redact('observations?series_id=DFF&api_key=abc123&file_type=json')
+    'observations?series_id=DFF&api_key=REDACTED&file_type=json'
+    """
+    return _REDACTED.sub(r'\1=REDACTED', str(text))
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far, in MB (None if unknown)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+class _NullSpan:
+    """
+    Shared stand-in used while tracing is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """
+    Time one stage and emit a record to every sink when it ends
+
+    Attach measurements such as bytes or rows with span.set(...).
+    """
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.parent = _PARENT.get()
+        self.parent_token = _PARENT.set(self.name)
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        _PARENT.reset(self.parent_token)
+        record = {
+            'name': self.name,
+            'start': self.start,
+            'seconds': seconds,
+            'parent': self.parent,
+            'thread': threading.current_thread().name,
+            'peak_rss_mb': peak_rss_mb(),
+            **self.attrs,
+        }
+        if exc_type is not None:
+            record['error'] = redact(f"{exc_type.__name__}: {exc}")
+        for sink in list(_SINKS):
+            sink.emit(record)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+def span(name, **attrs):
+    """
+    Context manager timing a stage; a shared no-op while tracing is off
+
+    Example:
+    >>> with span('fetch', series_id='DFF') as s:
+    ...     s.set(rows=len(series))
+    """
+    if not _SINKS:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+def traced(name=None):
+    """
+    Decorator wrapping every call of a function in a span
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _SINKS:
+                return func(*args, **kwargs)
+            with Span(label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorate
@@ -1,13 +1,153 @@
 # Third Cell - Data Transformation
+import hashlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
+from fred_cache import frame_fingerprint
+from fred_config import FILL_POLICIES, REGIMES, TRANSFORM_MEMO_DIR, TRANSFORM_MEMO_SIZE
+from fred_trace import span
 
-def fred_transform(df, start_date):
 
-    # Call fill missing value function
-    df = fill_missing_values(df)
-    # Option-Adjusted Spread Calc: Average over each quarter
+class TransformMemo:
+    """
+    Bounded LRU of full-history transforms with an optional on-disk tier
+
+    Entries are keyed by transform_key(); the least recently used entry is
+    evicted once max_entries are held. With disk_dir set, every entry is
+    also written there as Parquet and read back on a memory miss.
+    """
+    def __init__(self, max_entries=TRANSFORM_MEMO_SIZE, disk_dir=TRANSFORM_MEMO_DIR):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.parquet")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        if self.disk_dir and os.path.exists(self.disk_path(key)):
+            from fred_writer import fred_read
+            df = fred_read(self.disk_path(key))
+            self.put(key, df, persist=False)
+            with self.lock:
+                self.hits += 1
+            return df
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, df, persist=True):
+        with self.lock:
+            self.entries[key] = df
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        if persist and self.disk_dir:
+            from fred_writer import fred_save
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self.disk_path(key)
+            fred_save(df, path + '.tmp', format='parquet')
+            os.replace(path + '.tmp', path)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared by every fred_transform call in the process
+TRANSFORM_MEMO = TransformMemo()
+
+def fred_transform(df, start_date, columns=None, profile=False, compact=False,
+                   memo=TRANSFORM_MEMO):
+    """
+    Run the transformation plan and keep rows from start_date onward
+
+    Example:
+    >>> df = fred_transform(df, start_date='1996-12-31',
+    ...                     columns=['quarterly_spread', 'economic_period'])
+
+    The full history of df is transformed once and memoized under a
+    fingerprint of df; later calls on the same data that differ only in
+    start_date slice the cached result instead of recomputing.
+
+    Args:
+        df: Raw indicator frame from fred_load()
+        start_date: First date kept in the output
+        columns: Output columns wanted; None keeps every column. Steps and
+            source columns nothing downstream needs are skipped.
+        profile: Print per-stage rows, time and memory (bypasses the memo)
+        compact: Shrink the result with compact_frame()
+        memo: TransformMemo to use, or None to always recompute
+
+    Returns:
+        Transformed DataFrame
+    """
+    with span('fred_transform', rows=len(df)) as transform:
+        if memo is None or profile or not len(df):
+            plan = build_transform_plan(start_date, columns)
+            result = run_transform_plan(df, plan, profile=profile)
+            if compact:
+                result = compact_frame(result)
+        else:
+            key = transform_key(df, columns, compact)
+            full = memo.get(key)
+            transform.set(memo_hit=full is not None)
+            if full is None:
+                plan = build_transform_plan(df.index.min(), columns)
+                full = run_transform_plan(df, plan)
+                if compact:
+                    full = compact_frame(full)
+                memo.put(key, full)
+            result = full[full.index >= pd.to_datetime(start_date)]
+        transform.set(output_rows=len(result), columns=result.shape[1])
+    return result
 
+def transform_key(df, columns=None, compact=False):
+    """
+    Memo key for a full-history transform: the input's fingerprint plus
+    everything else the result depends on (requested columns, compaction,
+    regime boundaries, fill policies and this module's code)
+    """
+    payload = json.dumps({
+        'frame': frame_fingerprint(df),
+        'columns': columns,
+        'compact': compact,
+        'regimes': REGIMES,
+        'fill_policies': FILL_POLICIES,
+        'code': _code_version(),
+    }, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+_CODE_VERSION = None
+
+def _code_version():
+    global _CODE_VERSION
+    if _CODE_VERSION is None:
+        with open(__file__, 'rb') as f:
+            _CODE_VERSION = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    return _CODE_VERSION
+
+def add_quarterly_spread(df):
+    # Option-Adjusted Spread Calc: Average over each quarter
     """
     Snowflake SQL Equivalent:
     SELECT 
@@ -18,89 +158,203 @@ def fred_transform(df, start_date):
     FROM df
     )"""
     df['quarterly_spread'] = (df.groupby(df.index.to_period('Q'))['option_adjusted_spread'].transform('mean'))
+    return df
 
+def add_loan_forward_metrics(df):
     # Add forward-looking delinquency rates
-    df = create_forward_metrics(
+    return create_forward_metrics(
     df,
     metric_column='delinquency_rate_loans',
-    prefix='loan_delinq'
+    prefix='loan_delinq',
+    intervals=FORWARD_INTERVALS
     )
 
-    # Date processing
-    df = df.reset_index()
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
+def add_quarter_labels(df):
+    # Quarter strings like 3Q24
     df['quarter'] = df.index.quarter.astype(str) + "Q" + df.index.year.astype(str).str[-2:]
+    return df
 
-    # Add period classifications
-    df = classify_periods(df)
+def compact_frame(df, rtol=1e-6):
+    """
+    Shrink a transformed frame for holding many report variants in memory
 
-    #Get start date for more granular analysis
-    start_date = pd.to_datetime(start_date)
-    df = df[df.index >= start_date]
+    - quarter strings become quarter_code, the integer quarter ordinal
+      (pd.Period(ordinal=code, freq='Q') turns it back into a quarter)
+    - text columns such as economic_period become categoricals
+    - float64 columns become float32 when every value survives the round
+      trip within rtol (FRED publishes at most a few decimals)
+    """
+    df = df.copy()
+
+    if 'quarter' in df.columns:
+        position = df.columns.get_loc('quarter')
+        codes = df.index.to_period('Q').asi8.astype('int32')
+        df = df.drop(columns='quarter')
+        df.insert(position, 'quarter_code', codes)
+
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            df[column] = values.astype('category')
+        elif values.dtype == 'float64':
+            narrowed = values.to_numpy().astype('float32')
+            if np.allclose(narrowed, values.to_numpy(), rtol=rtol, atol=0,
+                           equal_nan=True):
+                df[column] = narrowed
 
     return df
 
-def classify_periods(df):
+def memory_report(df):
+    """
+    Memory used by each column (including the index), largest first
+
+    Returns:
+        DataFrame with dtype, bytes and share of the frame total
+    """
+    usage = df.memory_usage(deep=True)
+    report = pd.DataFrame({
+        'dtype': [str(df.index.dtype) if name == 'Index' else str(df[name].dtype)
+                  for name in usage.index],
+        'bytes': usage.to_numpy(),
+    }, index=usage.index)
+    report['share'] = report['bytes'] / report['bytes'].sum()
+    return report.sort_values('bytes', ascending=False)
+
+def classify_periods(df, regimes=REGIMES):
    #Label economic periods
    """
     Snowflake SQL Equivalent:
    SELECT *,
        CASE 
-           WHEN date < '2008-01-01' THEN 'Pre-GFC'
-           WHEN date < '2010-01-01' THEN 'Great Recession'
-           WHEN date < '2020-01-01' THEN 'Post-Crisis'
-           ELSE 'Post-COVID'
+           WHEN date < '2007-10-01' THEN 'Pre-GFC (1996-2007)'
+           WHEN date < '2009-06-30' THEN 'Great Recession (2008-2010)'
+           WHEN date < '2020-01-01' THEN 'Post-Crisis (2010-2020)'
+           ELSE 'Covid to Present (2020-2024)'
        END AS economic_period
    FROM fred_data
+
+   Boundaries come from the regimes list (fred_config.REGIMES by default).
+   One searchsorted over the start dates labels the whole index, and the
+   result is a categorical column ordered like the regimes list. Dates
+   before a dated first regime are left as NaN.
    """
-   df['economic_period'] = df.index.map(lambda date:
-        'Pre-GFC (1996-2007)' if date < pd.Timestamp('2007-10-01')
-        else 'Great Recession (2008-2010)' if date < pd.Timestamp('2009-06-30')
-        else 'Post-Crisis (2010-2020)' if date < pd.Timestamp('2020-01-01')
-        else 'Covid to Present (2020-2024)'
-    )
+   labels = list(dict.fromkeys(regime['label'] for regime in regimes))
+   label_codes = np.array([labels.index(regime['label']) for regime in regimes])
+   starts = pd.DatetimeIndex([regime['start'] or pd.Timestamp.min
+                              for regime in regimes])
+
+   # Position of the last regime starting on or before each date
+   position = starts.searchsorted(df.index, side='right') - 1
+   codes = np.where(position >= 0, label_codes[position], -1)
+
+   df['economic_period'] = pd.Categorical.from_codes(codes, categories=labels)
    return df
 
-def fill_missing_values(df):
-        # Fill down credit card delinquency data + loan delinquency data (only available quarterly) and spreads (averaging)
+def fill_missing_values(df, policies=FILL_POLICIES):
+    # Fill gaps in the quarterly delinquency rates and the daily spread, each
+    # column by its own policy
     """
-    Snowflake SQL Equivalent:
-    with cte AS (
+    Snowflake SQL Equivalent (ffill with max_gap_days):
+    SELECT
+        date,
+        CASE WHEN DATEDIFF(day, last_date, date) <= 92 THEN last_value END
+            AS delinquency_rate_loans
+    FROM (
         SELECT
             date,
-            COALESCE(
-                delinquency_rate_loans,
-                LAG(delinquency_rate_loans) OVER (ORDER BY date)
-            ) AS delinquency_rate_loans,
-            COALESCE(
-                delinquency_rate_credit_cards,
-                LAG(delinquency_rate_credit_cards) OVER (ORDER BY date)
-            ) AS delinquency_rate_credit_cards,
-            COALESCE(
-                quarterly_spreads,
-                LAG(quarterly_spreads) OVER (ORDER BY date)
-            ) AS quarterly_spreads,
+            LAST_VALUE(delinquency_rate_loans IGNORE NULLS)
+                OVER (ORDER BY date) AS last_value,
+            LAST_VALUE(IFF(delinquency_rate_loans IS NULL, NULL, date) IGNORE NULLS)
+                OVER (ORDER BY date) AS last_date
         FROM fred_data )
-    I'd join back on this cte by date in the main table.
+
+    policies maps a column to its method ('ffill', 'bfill' or 'interpolate'),
+    an optional row limit and an optional max_gap_days (see
+    fred_config.FILL_POLICIES). The frame is used in ascending date order
+    (sorted once only if it isn't already); the previous and next
+    observation of every cell in every policy column come from one
+    cumulative max/min over the block, and each policy is then a mask and
+    a gather on those positions.
+
+    Returns a new frame; the input is not modified. Cells filled per
+    column are recorded in the result's attrs['fill_report'].
     """
-    df = df.sort_index(ascending=False)
+    # A new frame either way; the policy columns are replaced below, never
+    # written into the caller's arrays
+    if df.index.is_monotonic_increasing:
+        df = df.copy(deep=False)
+    else:
+        df = df.sort_index()
 
-    columns_to_fill = [
-        'delinquency_rate_credit_cards',
-        'option_adjusted_spread',
-        'quarterly_spread'
-    ]
+    columns = [column for column in policies if column in df.columns]
+    report = {}
+    if columns:
+        values = df[columns].to_numpy(dtype='float64', copy=True)
+        missing = np.isnan(values)
+        n_rows = len(values)
+        rows = np.arange(n_rows)[:, None]
+        stamps = df.index.asi8
 
-    columns_to_fill = [col for col in columns_to_fill if col in df.columns]
+        # Row of the last observation at or before, and the next at or after,
+        # each cell
+        previous = np.maximum.accumulate(np.where(missing, -1, rows), axis=0)
+        following = np.where(missing, n_rows, rows)[::-1]
+        following = np.minimum.accumulate(following, axis=0)[::-1]
 
-    if columns_to_fill:
-        df[columns_to_fill] = df[columns_to_fill].ffill()
+        for j, column in enumerate(columns):
+            policy = policies[column]
+            method = policy['method']
+            limit = policy.get('limit')
+            max_gap = policy.get('max_gap_days')
+            max_gap = None if max_gap is None else pd.Timedelta(days=max_gap).value
 
-    df = df.sort_index()
+            before = np.clip(previous[:, j], 0, n_rows - 1)
+            after = np.clip(following[:, j], 0, n_rows - 1)
+            has_before = missing[:, j] & (previous[:, j] >= 0)
+            has_after = missing[:, j] & (following[:, j] < n_rows)
+
+            if method == 'ffill':
+                fill = has_before
+                if limit is not None:
+                    fill &= rows[:, 0] - before <= limit
+                if max_gap is not None:
+                    fill &= stamps - stamps[before] <= max_gap
+                values[fill, j] = values[before[fill], j]
+            elif method == 'bfill':
+                fill = has_after
+                if limit is not None:
+                    fill &= after - rows[:, 0] <= limit
+                if max_gap is not None:
+                    fill &= stamps[after] - stamps <= max_gap
+                values[fill, j] = values[after[fill], j]
+            elif method == 'interpolate':
+                # Only gaps bracketed by two observations, linear in time
+                fill = has_before & has_after
+                if limit is not None:
+                    fill &= rows[:, 0] - before <= limit
+                if max_gap is not None:
+                    fill &= stamps[after] - stamps[before] <= max_gap
+                start, stop = before[fill], after[fill]
+                weight = (stamps[fill] - stamps[start]) / (stamps[stop] - stamps[start])
+                step = values[stop, j] - values[start, j]
+                values[fill, j] = values[start, j] + weight * step
+            else:
+                raise ValueError(f"Unknown fill method '{method}' for {column}")
+
+            report[column] = {'method': method, 'missing': int(missing[:, j].sum()),
+                              'filled': int(fill.sum())}
+
+        for j, column in enumerate(columns):
+            df[column] = values[:, j]
+
+    df.attrs['fill_report'] = report
     return df
 
-def create_forward_metrics(df, metric_column, prefix, intervals=[3, 6, 9, 12, 18, 24]):
+# Months covered by each supported period grain
+PERIOD_MONTHS = {'M': 1, 'Q': 3, 'Y': 12}
+
+def create_forward_metrics(df, metric_column, prefix, intervals=[3, 6, 9, 12, 18, 24],
+                           freq='Q'):
     """
     Create forward-looking values at specified monthly intervals for any metric
 
@@ -110,15 +364,195 @@ def create_forward_metrics(df, metric_column, prefix, intervals=[3, 6, 9, 12, 18
         PARTITION BY QUARTER(Date)
         ORDER BY date DESC
     ) as forward_metric,
+
+    metric_column and prefix may also be equal-length lists to build several
+    metrics in one call. freq sets the period grain ('M', 'Q' or 'Y'); every
+    interval must be a whole number of periods. The period code of each row
+    and the last value per period are computed once, all shifts are built as
+    one block and broadcast back to the rows with a single take.
     """
-    for months in intervals:
-        # Calculate the number of quarters to shift
-        quarters_shift = months // 3
+    if isinstance(metric_column, str):
+        metric_columns = [metric_column]
+    else:
+        metric_columns = list(metric_column)
+    prefixes = [prefix] if isinstance(prefix, str) else list(prefix)
+    if len(metric_columns) != len(prefixes):
+        raise ValueError("metric_column and prefix must have the same length")
+
+    period_months = PERIOD_MONTHS[freq]
+    if any(months % period_months for months in intervals):
+        raise ValueError(f"Intervals {intervals} must be multiples of {period_months} "
+                         f"months for freq '{freq}'")
+
+    # Period code of every row (-1 for missing dates)
+    codes, _ = pd.factorize(df.index.to_period(freq), sort=True)
+
+    # Last value of each metric per period: shape (periods, metrics)
+    last_values = df[metric_columns].groupby(codes).last().to_numpy(dtype='float64')
+    n_periods = len(last_values)
+
+    # Shift every metric by every horizon at once: shape
+    # (periods + 1, metrics, horizons). The trailing all-NaN row is what
+    # code -1 picks up.
+    block = np.full((n_periods + 1, len(metric_columns), len(intervals)), np.nan)
+    for j, months in enumerate(intervals):
+        shift = months // period_months
+        if shift < n_periods:
+            block[:n_periods - shift, :, j] = last_values[shift:]
+
+    # Broadcast back to rows and add the columns directly to the dataframe
+    forward = block[codes]
+    for i, column_prefix in enumerate(prefixes):
+        for j, months in enumerate(intervals):
+            df[f'{column_prefix}_{months}m_forward'] = forward[:, i, j]
+
+    return df
+
+# Forward horizons (months) built by the transformation plan
+FORWARD_INTERVALS = [3, 6, 9, 12, 18, 24]
+
+def fill_lookback(policies=FILL_POLICIES):
+    """
+    How far before start_date fill_missing_values must see rows for the
+    first kept row to be filled as on the full history: the longest
+    max_gap_days of the policies that carry values forward, or None
+    (unbounded) when one of them has no max_gap_days
+    """
+    gaps = [policy.get('max_gap_days') for policy in policies.values()
+            if policy['method'] != 'bfill']
+    if any(gap is None for gap in gaps):
+        return None
+    return pd.Timedelta(days=max(gaps, default=0))
+
+# Transformation steps in execution order. Each step declares the columns it
+# reads and writes, plus 'align': the period grain whose full bucket must be
+# present around start_date for the step to be correct on the first kept row,
+# and 'lookback': how many days before start_date it reads (None for
+# unbounded). Forward metrics only look ahead and read the published
+# quarterly values, so they run before the fill and need no earlier rows.
+TRANSFORM_STEPS = [
+    {'name': 'forward_metrics', 'func': add_loan_forward_metrics,
+     'inputs': ['delinquency_rate_loans'],
+     'outputs': [f'loan_delinq_{months}m_forward' for months in FORWARD_INTERVALS],
+     'align': 'Q', 'lookback': pd.Timedelta(0)},
+    {'name': 'fill_missing_values', 'func': fill_missing_values,
+     'inputs': list(FILL_POLICIES), 'outputs': list(FILL_POLICIES),
+     'align': None, 'lookback': fill_lookback()},
+    {'name': 'quarterly_spread', 'func': add_quarterly_spread,
+     'inputs': ['option_adjusted_spread'], 'outputs': ['quarterly_spread'],
+     'align': 'Q', 'lookback': pd.Timedelta(0)},
+    {'name': 'quarter_labels', 'func': add_quarter_labels,
+     'inputs': [], 'outputs': ['quarter'], 'align': None, 'lookback': pd.Timedelta(0)},
+    {'name': 'classify_periods', 'func': classify_periods,
+     'inputs': [], 'outputs': ['economic_period'], 'align': None,
+     'lookback': pd.Timedelta(0)},
+]
+
+# Order of the derived columns in the output
+OUTPUT_ORDER = ['quarterly_spread',
+                *[f'loan_delinq_{months}m_forward' for months in FORWARD_INTERVALS],
+                'quarter', 'economic_period']
+
+def build_transform_plan(start_date, columns=None, steps=TRANSFORM_STEPS):
+    """
+    Record which steps to run, on which rows, without touching any data
+
+    Walks the steps backwards from the requested columns so only steps
+    (and source columns) feeding them are kept, then pushes the start_date
+    filter down to the earliest cutoff every kept step can tolerate.
+
+    Returns:
+        Dict with 'start_date', 'cutoff', 'steps', 'sources' and 'columns'
+    """
+    start_date = pd.to_datetime(start_date)
+
+    needed = None if columns is None else set(columns)
+    kept = []
+    for step in reversed(steps):
+        if needed is None or needed & set(step['outputs']):
+            kept.insert(0, step)
+            if needed is not None:
+                needed |= set(step['inputs'])
+
+    # Earliest row a kept step needs: the start of its period bucket, less
+    # the longest lookback (no cutoff at all when one is unbounded)
+    cutoff = start_date
+    for step in kept:
+        if step['align']:
+            cutoff = min(cutoff, start_date.to_period(step['align']).start_time)
+    lookbacks = [step['lookback'] for step in kept]
+    if None in lookbacks:
+        cutoff = None
+    else:
+        cutoff -= max(lookbacks, default=pd.Timedelta(0))
+
+    produced = {column for step in kept for column in step['outputs']
+                if column not in step['inputs']}
+    return {
+        'start_date': start_date,
+        'cutoff': cutoff,
+        'steps': kept,
+        'sources': None if needed is None else sorted(needed - produced),
+        'columns': None if columns is None else list(columns),
+    }
+
+def run_transform_plan(df, plan, profile=False):
+    """
+    Execute a plan from build_transform_plan on a raw indicator frame
+    """
+    stages = []
+
+    def record(name, started, df):
+        if profile:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            stages.append({
+                'stage': name,
+                'rows': len(df),
+                'seconds': time.perf_counter() - started,
+                'frame_mb': df.memory_usage(deep=True).sum() / 2**20,
+                'peak_mb': peak / 2**20,
+            })
+
+    if profile:
+        tracemalloc.start()
+    try:
+        # Early filter and column pruning
+        started = time.perf_counter()
+        index = pd.DatetimeIndex(df.index, name='date', freq=None)
+        if plan['cutoff'] is not None:
+            keep = index >= plan['cutoff']
+        else:
+            keep = np.ones(len(index), dtype=bool)
+        if plan['sources'] is not None:
+            df = df[[column for column in df.columns if column in plan['sources']]]
+        df = df[keep].copy()
+        df.index = index[keep]
+        record('filter', started, df)
+
+        for step in plan['steps']:
+            started = time.perf_counter()
+            with span(f"transform.{step['name']}", rows=len(df)):
+                df = step['func'](df)
+            record(step['name'], started, df)
 
-        # Get the last value for each quarter and shift it
-        forward_value = df.groupby(df.index.to_period('Q'))[metric_column].last().shift(-quarters_shift)
+        #Get start date for more granular analysis
+        df = df[df.index >= plan['start_date']]
+        if plan['columns'] is not None:
+            df = df[[column for column in plan['columns'] if column in df.columns]]
+        else:
+            # Derived columns in OUTPUT_ORDER, whatever order the steps ran in
+            df = df[[column for column in df.columns if column not in OUTPUT_ORDER]
+                    + [column for column in OUTPUT_ORDER if column in df.columns]]
+    finally:
+        if profile:
+            tracemalloc.stop()
 
-        # Add the column directly to the dataframe
-        df[f'{prefix}_{months}m_forward'] = df.index.to_period('Q').map(forward_value)
+    if profile:
+        print(f"{'stage':<22}{'rows':>8}{'seconds':>10}{'frame MB':>10}{'peak MB':>10}")
+        for stage in stages:
+            print(f"{stage['stage']:<22}{stage['rows']:>8}{stage['seconds']:>10.4f}"
+                  f"{stage['frame_mb']:>10.2f}{stage['peak_mb']:>10.2f}")
+        df.attrs['transform_profile'] = stages
 
     return df
@@ -0,0 +1,250 @@
+# File for point-in-time (ALFRED vintage) data
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import fred_loader
+from fred_config import INDICATORS, MAX_WORKERS, START_DATE, VINTAGE_DIR
+from fred_trace import span
+
+# FRED's bounds for real-time periods: the earliest vintage and "still current"
+FIRST_VINTAGE = '1776-07-04'
+OPEN_END = np.datetime64('9999-12-31', 'D')
+
+VINTAGE_COLUMNS = ['date', 'value', 'realtime_start', 'realtime_end']
+
+
+def compact_vintages(vintages):
+    """
+    Sort versions by (date, realtime_start) and merge back-to-back versions
+    of an observation that carry the same value
+
+    FRED reports a new real-time period whenever any vintage is published,
+    even if this observation did not change; merging those keeps the store
+    to one row per actual revision.
+    """
+    vintages = vintages.sort_values(['date', 'realtime_start'], kind='stable')
+    vintages = vintages.reset_index(drop=True)
+    if len(vintages) < 2:
+        return vintages
+
+    dates = vintages['date'].to_numpy()
+    values = vintages['value'].to_numpy()
+    starts = vintages['realtime_start'].to_numpy().astype('datetime64[D]')
+    ends = vintages['realtime_end'].to_numpy().astype('datetime64[D]')
+
+    same_value = ((values[1:] == values[:-1])
+                  | (np.isnan(values[1:]) & np.isnan(values[:-1])))
+    continues = (dates[1:] == dates[:-1]) & same_value & (starts[1:] <= ends[:-1] + 1)
+    # A row starts a new version unless it continues the previous one
+    first = np.concatenate([[True], ~continues])
+    groups = np.cumsum(first) - 1
+
+    merged_ends = np.full(groups[-1] + 1, np.datetime64('NaT'), dtype='datetime64[D]')
+    np.maximum.at(merged_ends.view('int64'), groups, ends.view('int64'))
+    compact = vintages[first].reset_index(drop=True)
+    compact['realtime_end'] = merged_ends
+    return compact
+
+class VintageIndex:
+    """
+    Sorted lookup structure answering "value of every observation as of T"
+
+    Versions are keyed by (observation, realtime_start) in one sorted int64
+    array, so an as-of query is one vectorized searchsorted over the
+    observation dates: O(dates log versions) per snapshot, with no scan of
+    the version history.
+    """
+    def __init__(self, vintages):
+        vintages = vintages.sort_values(['date', 'realtime_start'], kind='stable')
+        dates = vintages['date'].to_numpy().astype('datetime64[D]')
+        starts = vintages['realtime_start'].to_numpy().astype('datetime64[D]')
+        ends = vintages['realtime_end'].to_numpy().astype('datetime64[D]')
+        self.starts = starts.view('int64')
+        self.ends = ends.view('int64')
+        self.values = vintages['value'].to_numpy(dtype='float64')
+        self.dates, self.codes = np.unique(dates, return_inverse=True)
+
+        self.origin = self.starts.min() if len(self.starts) else 0
+        self.span = (self.starts.max() - self.origin + 2) if len(self.starts) else 1
+        self.keys = self.codes * self.span + (self.starts - self.origin)
+        self.groups = np.arange(len(self.dates), dtype='int64')
+
+    def lookup(self, when):
+        """
+        Observation dates and values as known on when
+
+        Returns:
+            (dates datetime64[D], values float64) for observations published
+            by when, each at the version current on that day
+        """
+        day = np.datetime64(pd.Timestamp(when).date(), 'D').astype('int64')
+        if not len(self.keys):
+            return self.dates, self.values
+
+        query = self.groups * self.span + min(max(day - self.origin, -1), self.span - 1)
+        position = np.searchsorted(self.keys, query, side='right') - 1
+        clipped = np.maximum(position, 0)
+        valid = ((position >= 0) & (self.codes[clipped] == self.groups)
+                 & (self.ends[clipped] >= day))
+        return self.dates[valid], self.values[clipped[valid]]
+
+class VintageStore:
+    """
+    Bitemporal store of every published version of each series
+
+    Example:
+    >>> store = VintageStore()
+    >>> store.update_many()                      # first call fetches all vintages
+    >>> known = store.as_of('2008-06-30')        # frame as it looked that day
+    >>> month_ends = pd.date_range('2005-01-01', '2010-12-31', freq='ME')
+    >>> for when, df in store.snapshots(month_ends):
+    ...     signal = fred_transform(df, '1996-12-31', memo=None)
+
+    Each series is one zstd Parquet file of (date, value, realtime_start,
+    realtime_end) rows, one per revision. update() only requests vintages
+    published since the newest one stored. Lookup indexes are built once
+    per series and kept in memory, so repeated snapshots never touch disk.
+    """
+    def __init__(self, store_dir=VINTAGE_DIR):
+        self.store_dir = store_dir
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def path(self, series_id):
+        return os.path.join(self.store_dir, f"{series_id}.parquet")
+
+    def read(self, series_id):
+        """
+        Stored versions of one series, or None if it has never been fetched
+        """
+        path = self.path(series_id)
+        if not os.path.exists(path):
+            return None
+        table = pq.read_table(path)
+        return pd.DataFrame({column: table.column(column).to_numpy()
+                             for column in VINTAGE_COLUMNS})
+
+    def write(self, series_id, vintages):
+        os.makedirs(self.store_dir, exist_ok=True)
+        table = pa.table({
+            'date': pa.array(vintages['date'].to_numpy().astype('datetime64[D]')),
+            'value': pa.array(vintages['value'].to_numpy(dtype='float64')),
+            'realtime_start': pa.array(
+                vintages['realtime_start'].to_numpy().astype('datetime64[D]')),
+            'realtime_end': pa.array(
+                vintages['realtime_end'].to_numpy().astype('datetime64[D]')),
+        })
+        path = self.path(series_id)
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+    def update(self, series_id, start_date=START_DATE, session=None):
+        """
+        Fetch vintages published since the newest stored one and merge them
+
+        Stored versions still open at the newest vintage date are closed
+        the day before it and replaced by what FRED reports from then on.
+        If the fetch fails the store is left untouched.
+
+        Returns:
+            Compacted versions of the series (the stored ones unchanged, or
+            an empty frame, when the fetch failed)
+        """
+        stored = self.read(series_id)
+        if stored is None:
+            since = FIRST_VINTAGE
+        else:
+            since = str(stored['realtime_start'].max().date())
+        fresh = fred_loader.get_fred_data(series_id, start_date, session,
+                                          realtime_start=since,
+                                          realtime_end=str(OPEN_END))
+        if 'vintage_window' not in fresh.attrs:
+            return stored if stored is not None else fresh
+        if stored is None and fresh.empty:
+            return fresh
+
+        if stored is not None:
+            since_day = np.datetime64(since, 'D')
+            starts = stored['realtime_start'].to_numpy().astype('datetime64[D]')
+            stored = stored[starts < since_day].copy()
+            ends = stored['realtime_end'].to_numpy().astype('datetime64[D]')
+            stored['realtime_end'] = np.minimum(ends, since_day - 1)
+            if fresh.empty:
+                fresh = stored
+            else:
+                fresh = pd.concat([stored, fresh], ignore_index=True)
+
+        vintages = compact_vintages(fresh)
+        self.write(series_id, vintages)
+        with self.lock:
+            self.indexes.pop(series_id, None)
+        return vintages
+
+    def update_many(self, indicators=INDICATORS, start_date=START_DATE,
+                    max_workers=MAX_WORKERS):
+        """
+        Update every indicator's vintages on a bounded thread pool
+
+        Returns:
+            Dict of indicator name -> number of stored versions
+        """
+        versions = fred_loader.map_series(
+            lambda session, name, info: self.update(info['id'], start_date, session),
+            indicators, max_workers)
+        return {name: len(vintages) for name, vintages in versions.items()}
+
+    def index(self, series_id):
+        """
+        Lookup index for one series, built on first use
+        """
+        with self.lock:
+            index = self.indexes.get(series_id)
+        if index is None:
+            stored = self.read(series_id)
+            if stored is None:
+                stored = pd.DataFrame({
+                    column: np.array([], dtype='float64' if column == 'value'
+                                     else 'datetime64[D]')
+                    for column in VINTAGE_COLUMNS})
+            index = VintageIndex(stored)
+            with self.lock:
+                self.indexes[series_id] = index
+        return index
+
+    def as_of_series(self, series_id, when):
+        """
+        One series as it was known on when
+        """
+        dates, values = self.index(series_id).lookup(when)
+        index = pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='date')
+        return pd.Series(values, index=index, name='value')
+
+    def as_of(self, when, indicators=INDICATORS):
+        """
+        Get every indicator as it was known on when
+
+        Returns:
+            DataFrame shaped like fred_load(): an outer join on observation
+            dates with one column per indicator
+        """
+        with span('vintage_as_of', when=str(when)):
+            frame = pd.DataFrame({name: self.as_of_series(info['id'], when)
+                                  for name, info in indicators.items()})
+            return frame.rename_axis('date')
+
+    def snapshots(self, dates, indicators=INDICATORS):
+        """
+        Yield (date, frame as known on date) for a rolling backtest
+
+        Indexes are loaded once up front; each snapshot is then only
+        in-memory lookups.
+        """
+        for info in indicators.values():
+            self.index(info['id'])
+        for when in dates:
+            yield when, self.as_of(when, indicators)
@@ -1,14 +1,89 @@
 # visualizations.py
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
 import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from fpdf import FPDF
-from plotly.subplots import make_subplots
 
-from fred_config import COLORS
+from fred_cache import frame_fingerprint
+from fred_config import (
+    COLORS,
+    FIGURE_CACHE_SIZE,
+    PLOT_DOWNSAMPLE,
+    PLOT_POINT_BUDGET,
+    PLOT_WEBGL,
+)
+from fred_downsample import line_indices, scatter_indices
+from fred_stats import (
+    compute_regime_stats,
+    compute_rolling_correlation,
+    fit_regression_grid,
+)
+from fred_trace import span, traced
+
+# plotly, kaleido and fpdf are imported inside the functions that draw or
+# export, so importing this module (or anything that imports it) stays cheap
+
+
+# Built figures, least recently used first
+_FIGURE_CACHE = OrderedDict()
+_FIGURE_CACHE_LOCK = threading.Lock()
+
+def figure_key(func, args, kwargs):
+    """
+    Cache key for a figure builder call: a fingerprint of every frame
+    argument plus the builder's name and its other arguments
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    payload = json.dumps({
+        'builder': func.__name__,
+        'arguments': {name: (frame_fingerprint(value)
+                             if isinstance(value, pd.DataFrame) else value)
+                      for name, value in bound.arguments.items()},
+    }, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def cached_figure(func):
+    """
+    Serve repeat calls of a figure builder on the same data and spec from
+    memory (the last FIGURE_CACHE_SIZE figures)
 
+    Callers get a copy, so restyling a returned figure never changes the
+    cached one.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if FIGURE_CACHE_SIZE <= 0:
+            return func(*args, **kwargs)
+
+        import plotly.graph_objects as go
+
+        key = figure_key(func, args, kwargs)
+        with _FIGURE_CACHE_LOCK:
+            fig = _FIGURE_CACHE.get(key)
+            if fig is not None:
+                _FIGURE_CACHE.move_to_end(key)
+        with span('figure_cache', builder=func.__name__, hit=fig is not None):
+            if fig is None:
+                fig = func(*args, **kwargs)
+                with _FIGURE_CACHE_LOCK:
+                    _FIGURE_CACHE[key] = fig
+                    while len(_FIGURE_CACHE) > FIGURE_CACHE_SIZE:
+                        _FIGURE_CACHE.popitem(last=False)
+            return go.Figure(fig)
+    return wrapper
+
+def clear_figure_cache():
+    with _FIGURE_CACHE_LOCK:
+        _FIGURE_CACHE.clear()
 
 def prepare_viz_data(df, start_date='1996-12-31'):
     """
@@ -21,6 +96,7 @@ def prepare_viz_data(df, start_date='1996-12-31'):
     df_viz['year'] = df_viz.index.year
     return df_viz
 
+@traced()
 def fred_visualize(df):
     # Prepare data
     df_viz = prepare_viz_data(df)
@@ -28,16 +104,23 @@ def fred_visualize(df):
     print("Credit Risk Analysis Results:")
     # Create visualizations
     stats_table = create_stats_table(df_viz)
-    covid_plot = plot_covid_relationship(df_viz)
-    pregfc_plot = plot_pregfc_relationship(df_viz)
+    # Fit both scatter trendlines in one pass
+    grid = fit_regression_grid(df_viz, ['quarterly_spread'],
+                               ['loan_delinq_12m_forward'])
+    covid_plot = plot_covid_relationship(df_viz, grid)
+    pregfc_plot = plot_pregfc_relationship(df_viz, grid)
     time_series_plot = plot_time_series(df_viz)
 
     return stats_table,covid_plot, pregfc_plot, time_series_plot
 
+@traced()
+@cached_figure
 def create_stats_table(df):
     """
     Create a visually enhanced statistical summary table by market regime with improved formatting.
     """
+    import plotly.graph_objects as go
+
     def format_correlation(value, is_r_squared=False):
         """Helper function to format and color-code correlation values"""
         if is_r_squared:
@@ -79,10 +162,18 @@ def create_stats_table(df):
              'func': 'corr_squared', 'base_column': 'option_adjusted_spread', 'format': '{:.2f}'}
         ])
 
-    # Calculate statistics
-    results = []
+    # Calculate statistics in one grouped pass
     regimes = df['economic_period'].unique()
+    stats = compute_regime_stats(
+        df,
+        columns=[m['column'] for m in metrics if m.get('func') in ('mean', 'std')],
+        base_column='option_adjusted_spread',
+        targets=[m['column'] for m in metrics if m.get('func') == 'corr'],
+    )
+    stat_names = {'mean': 'mean', 'std': 'std', 'corr': 'r', 'corr_squared': 'r2'}
+    lookup = stats.set_index(['stat', 'column', 'regime'])['value'].to_dict()
 
+    results = []
     for metric in metrics:
         if metric.get('is_header'):
             row = {'Metric': f'<b>{metric["name"]}</b>', **{regime: '' for regime in regimes}}
@@ -90,30 +181,21 @@ def create_stats_table(df):
             row = {'Metric': f'  {metric["name"]}'}
 
             for regime in regimes:
-                regime_data = df[df['economic_period'] == regime]
-                try:
-                    if metric.get('func') == 'corr':
-                        # Calculate correlation using the base column and target column
-                        corr = regime_data[metric['base_column']].corr(regime_data[metric['column']])
-                        row[regime] = format_correlation(corr, is_r_squared=False)
-
-                    elif metric.get('func') == 'corr_squared':
-                        # Calculate R² as the square of the correlation
-                        corr = regime_data[metric['base_column']].corr(regime_data[metric['column']])
-                        r_squared = corr ** 2
-                        row[regime] = format_correlation(r_squared, is_r_squared=True)
-
-                    else:
-                        # Handle other statistics (mean, std, etc.)
-                        value = getattr(regime_data[metric['column']], metric['func'])()
-                        # Convert percentage points to basis points for spread metrics
-                        if metric['column'] == 'option_adjusted_spread':
-                            value = value * 100
-                        row[regime] = metric['format'].format(value)
-
-                except Exception as e:
-                    print(f"Error calculating {metric['name']} for {regime}: {str(e)}")
+                value = lookup.get((stat_names[metric['func']], metric['column'],
+                                    regime))
+                if value is None:
+                    print(f"Error calculating {metric['name']} for {regime}: "
+                          f"missing column {metric['column']}")
                     row[regime] = 'N/A'
+                elif metric['func'] == 'corr':
+                    row[regime] = format_correlation(value, is_r_squared=False)
+                elif metric['func'] == 'corr_squared':
+                    row[regime] = format_correlation(value, is_r_squared=True)
+                else:
+                    # Convert percentage points to basis points for spread metrics
+                    if metric['column'] == 'option_adjusted_spread':
+                        value = value * 100
+                    row[regime] = metric['format'].format(value)
 
         results.append(row)
     fig = go.Figure(data=[go.Table(
@@ -203,26 +285,72 @@ def create_stats_table(df):
     )
     return fig
 
-def plot_pregfc_relationship(current_df):
-    """Create current analysis plot"""
-    current_df = current_df[current_df['economic_period'] == 'Pre-GFC (1996-2007)']
-    correlation = current_df['option_adjusted_spread'].corr(current_df['loan_delinq_12m_forward'])
+# Axis labels for the relationship scatter plots
+RELATIONSHIP_LABELS = {
+    'quarterly_spread': 'Average Quarterly Spread (%)',
+    'option_adjusted_spread': 'Option-Adjusted Spread (%)',
+    'loan_delinq_12m_forward': 'Next Year Delinquency Rate (%)',
+    'economic_period': 'Economic Period'
+}
+
+@cached_figure
+def plot_regime_relationship(df, regime, title, subtitle,
+                             x='quarterly_spread', y='loan_delinq_12m_forward',
+                             base_column=None, grid=None,
+                             point_budget=PLOT_POINT_BUDGET, webgl=PLOT_WEBGL):
+    """
+    Create a scatter plot of x vs y for one economic period with its OLS line
 
+    title and subtitle may reference {correlation}, the correlation of
+    base_column (the plotted x by default) with y inside the period. The
+    line comes from grid, a fit_regression_grid() result covering this
+    regime, x and y; it is fitted here when grid is omitted.
+
+    Only distinct points are drawn (quarterly values repeat on every daily
+    row), thinned to point_budget if needed; the fit and correlation always
+    use every row. webgl draws the points with scattergl.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    regime_df = df[df['economic_period'] == regime]
+    if grid is None:
+        grid = fit_regression_grid(regime_df, [x], [y])
+    fit = grid[(grid['regime'] == regime) & (grid['predictor'] == x)
+               & (grid['lag'] == 0) & (grid['target'] == y)].iloc[0]
+    if base_column is None or base_column == x:
+        correlation = fit['r']
+    else:
+        correlation = regime_df[base_column].corr(regime_df[y])
+
+    positions = scatter_indices(regime_df[x].to_numpy(dtype='float64'),
+                                regime_df[y].to_numpy(dtype='float64'), point_budget)
+    points = regime_df.iloc[positions]
     fig = px.scatter(
-        current_df,
-        x='quarterly_spread',
-        y='loan_delinq_12m_forward',
+        points,
+        x=x,
+        y=y,
         color='economic_period',
-        trendline="ols",
-        title='High Yield Spreads Predict Future Loan Delinquencies<br>' +
-              f'<span style="font-size: 14px">Correlation: {correlation:.3f}</span>',
-        labels={
-            'quarterly_spread': 'Average Quarterly Spread (%)',
-            'loan_delinq_12m_forward': 'Next Year Delinquency Rate (%)',
-            'economic_period': 'Economic Period'
-        }
+        labels=RELATIONSHIP_LABELS,
+        render_mode='webgl' if webgl else 'svg'
     )
 
+    # Precomputed least-squares line across the observed x range
+    observed = regime_df[x].where(regime_df[y].notna()).dropna()
+    if len(observed):
+        line_x = [observed.min(), observed.max()]
+        fig.add_trace(go.Scatter(
+            x=line_x,
+            y=[fit['intercept'] + fit['slope'] * value for value in line_x],
+            mode='lines',
+            name=regime,
+            showlegend=False,
+            line=dict(color=fig.data[0].marker.color),
+            hovertemplate=(f"<b>OLS trendline</b><br>{y} = {fit['slope']:.6g} * {x}"
+                           f" + {fit['intercept']:.6g}"
+                           f"<br>R<sup>2</sup>={fit['r2']:.6f}<extra></extra>")
+        ))
+
     fig.update_layout(
         # Legend configuration
         legend=dict(
@@ -235,45 +363,38 @@ def plot_pregfc_relationship(current_df):
         )
     )
 
-    apply_standard_formatting(fig, "Pre-2008 Credit Risk Dynamics: OAS as Leading Indicator of Delinquency Rates", f"Strong Predictive Relationship (r = {correlation:.3f})")
+    apply_standard_formatting(fig, title.format(correlation=correlation),
+                              subtitle.format(correlation=correlation))
     return fig
 
-def plot_covid_relationship(prediction_df):
-    """Create scatter plot of predictive relationship"""
-    prediction_df = prediction_df[prediction_df['economic_period'] == 'Covid to Present (2020-2024)']
-    correlation = prediction_df['option_adjusted_spread'].corr(prediction_df['loan_delinq_12m_forward'])
-
-    fig = px.scatter(
-        prediction_df,
-        x='quarterly_spread',
-        y='loan_delinq_12m_forward',
-        color='economic_period',
-        trendline="ols",
-        title=f'Predictive Analysis (Correlation: {correlation:.3f})',
-        labels={
-            'quarterly_spread': 'Average Quarterly Spread (%)',
-            'loan_delinq_12m_forward': 'Next Year Delinquency Rate (%)',
-            'economic_period': 'Economic Period'
-        }
+def plot_pregfc_relationship(current_df, grid=None):
+    """Create current analysis plot"""
+    return plot_regime_relationship(
+        current_df,
+        'Pre-GFC (1996-2007)',
+        "Pre-2008 Credit Risk Dynamics: OAS as Leading Indicator of Delinquency Rates",
+        "Strong Predictive Relationship (r = {correlation:.3f})",
+        grid=grid
     )
 
-    fig.update_layout(
-        # Legend configuration
-        legend=dict(
-            title="Economic Period",
-            borderwidth=1,
-            bordercolor='#E5E5E5',
-            bgcolor='rgba(255, 255, 255, 0.9)',
-            x=0.02,
-            y=0.98
-        )
+def plot_covid_relationship(prediction_df, grid=None):
+    """Create scatter plot of predictive relationship"""
+    return plot_regime_relationship(
+        prediction_df,
+        'Covid to Present (2020-2024)',
+        "Credit Risk Dynamics: OAS as Leading Indicator of Delinquency Rates "
+        "(2020-2024)",
+        " Correlation Analysis Shows Weakened Predictive Relationship "
+        "(r = {correlation:.3f})",
+        grid=grid
     )
 
-    apply_standard_formatting(fig, "Credit Risk Dynamics: OAS as Leading Indicator of Delinquency Rates (2020-2024)", f" Correlation Analysis Shows Weakened Predictive Relationship (r = {correlation:.3f})")
-    return fig
-
+@cached_figure
 def plot_time_series(df):
    """Create time series plot with clean styling and axis labels"""
+   import plotly.graph_objects as go
+   from plotly.subplots import make_subplots
+
    # Calculate annual averages
    df_annual = df.groupby('year').agg({
        'option_adjusted_spread': 'mean',
@@ -331,6 +452,86 @@ def plot_time_series(df):
 
    return fig
 
+@cached_figure
+def plot_rolling_correlation(df, base_column='option_adjusted_spread', targets=None,
+                             window='730D', stat='r', min_periods=60,
+                             point_budget=PLOT_POINT_BUDGET, method=PLOT_DOWNSAMPLE,
+                             webgl=PLOT_WEBGL):
+    """
+    Create a line chart of rolling correlation (or R²) between base_column
+    and each delinquency horizon
+
+    Example:
+    >>> fig = plot_rolling_correlation(df, window='1095D')
+    >>> # expanding window
+    >>> fig = plot_rolling_correlation(df, 'quarterly_spread', window=None, stat='r2')
+
+    Economic periods are shaded behind the lines so shifts in the
+    relationship can be read against each regime. Correlations are computed
+    on every row; each line is then downsampled to point_budget points.
+
+    Args:
+        df: Transformed frame with forward delinquency columns
+        base_column: Leading indicator
+        targets: Horizon columns (defaults to every loan_delinq_*m_forward)
+        window: Offset such as '730D', a row count, or None for expanding
+        stat: 'r' or 'r2'
+        min_periods: Fewest observations before a window is plotted
+        point_budget: Most points per line (None plots every row)
+        method: Downsampling method, 'lttb' or 'minmax'
+        webgl: Draw the lines with scattergl
+    """
+    import plotly.graph_objects as go
+
+    if targets is None:
+        targets = [column for column in df.columns
+                   if column.startswith('loan_delinq_') and column.endswith('_forward')]
+    rolling = compute_rolling_correlation(df, [base_column], targets, window,
+                                          min_periods)[stat][base_column]
+
+    fig = go.Figure()
+
+    # Shade each contiguous run of an economic period
+    periods = df['economic_period'].astype(str)
+    starts = periods.ne(periods.shift())
+    run_starts = df.index[starts.to_numpy()]
+    run_ends = list(run_starts[1:]) + [df.index[-1]]
+    for start, end, period in zip(run_starts, run_ends, periods[starts]):
+        fig.add_vrect(x0=start, x1=end, fillcolor=COLORS.get(period, '#E5E5E5'),
+                      opacity=0.08, line_width=0, layer='below')
+
+    trace = go.Scattergl if webgl else go.Scatter
+    for target in rolling.columns:
+        values = rolling[target].to_numpy()
+        positions = line_indices(rolling.index, values, point_budget, method)
+        name = target.replace('loan_delinq_', '').replace('_forward', ' ahead')
+        fig.add_trace(trace(x=rolling.index[positions], y=values[positions],
+                            mode='lines', name=name))
+
+    label = 'Correlation (r)' if stat == 'r' else 'R²'
+    span_label = 'Expanding' if window is None else f"Rolling {window}"
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title=label,
+        legend=dict(
+            title="Delinquency Horizon",
+            borderwidth=1,
+            bordercolor='#E5E5E5',
+            bgcolor='rgba(255, 255, 255, 0.9)',
+            x=0.02,
+            y=0.02,
+            yanchor='bottom'
+        )
+    )
+
+    apply_standard_formatting(
+        fig,
+        "Lead Relationship Over Time",
+        f"{span_label} {label} of {RELATIONSHIP_LABELS.get(base_column, base_column)}"
+        " vs Future Delinquency"
+    )
+    return fig
+
 def apply_standard_formatting(fig, title, subtitle=None):
     """Apply consistent, enhanced formatting to plots"""
     # Set main title and subtitle
@@ -399,49 +600,96 @@ def create_title(pdf, title="FRED Economic Analysis"):
     pdf.write(4, "Economic Analysis Report")
     pdf.ln(5)
 
-def fred_export(stats_table, current_plot, predictive_plot, time_series_plot, filename="fred_analysis.pdf"):
-    # Create tmp directory if it doesn't exist
-    os.makedirs("./tmp", exist_ok=True)
+# Kaleido renderer processes, started on first use and reused by every export
+_KALEIDO_SCOPES = []
+_KALEIDO_LOCK = threading.Lock()
+
+def get_kaleido_scopes(count):
+    """
+    Return count Kaleido scopes, starting new renderer processes only as needed
+
+    The first scope is plotly's own shared scope, so a single worker renders
+    exactly like fig.write_image.
+    """
+    import plotly.io as pio
+    from kaleido.scopes.plotly import PlotlyScope
+
+    with _KALEIDO_LOCK:
+        if not _KALEIDO_SCOPES:
+            _KALEIDO_SCOPES.append(pio.kaleido.scope)
+        while len(_KALEIDO_SCOPES) < count:
+            base = _KALEIDO_SCOPES[0]
+            _KALEIDO_SCOPES.append(PlotlyScope(plotlyjs=base.plotlyjs,
+                                               mathjax=base.mathjax))
+        return _KALEIDO_SCOPES[:count]
+
+def rasterize_figures(figures, max_workers=None):
+    """
+    Render figures to PNG bytes concurrently, entirely in memory
+
+    Each Kaleido scope renders one figure at a time, so figures are spread
+    over a small pool of long-lived scopes (one per worker, at most one per
+    CPU and never more than four).
+
+    Returns:
+        List of PNG bytes in the same order as figures
+    """
+    workers = max(1, min(len(figures), max_workers or min(os.cpu_count() or 1, 4)))
+    scopes = get_kaleido_scopes(workers)
+
+    def render(position):
+        scope = scopes[position % workers]
+        with span('render', figure=position) as render:
+            image = scope.transform(figures[position].to_dict(), format='png')
+            render.set(bytes=len(image))
+        return image
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # One context copy per task so render spans nest under the caller's span
+        futures = [pool.submit(contextvars.copy_context().run, render, position)
+                   for position in range(len(figures))]
+        return [future.result() for future in futures]
+
+@traced()
+def fred_export(stats_table, current_plot, predictive_plot, time_series_plot,
+                filename="fred_analysis.pdf", title="FRED Economic Analysis",
+                max_workers=None):
+    from fpdf import FPDF
 
     pdf = FPDF()  # A4 (210 by 297 mm)
     WIDTH = 210
-    HEADER_PATH = r"./resources/report_header.png"
-    ''' First Page '''
-    pdf.add_page()
-    pdf.image(HEADER_PATH, 0, 0, WIDTH)
-    create_title(pdf)
-
-    # Save plots as images
-    stats_table.write_image("./tmp/stats_table.png")
-    time_series_plot.write_image("./tmp/time_series_plot.png")
-
-    # Add plots to first page
-    pdf.image("./tmp/stats_table.png", 5, 35, WIDTH)
-    pdf.image("./tmp/time_series_plot.png", 5,140, WIDTH)
-
-    ''' Second Page '''
-    pdf.add_page()
-
-    # Save plots as images
-    current_plot.write_image("./tmp/current_plot.png")
-    predictive_plot.write_image("./tmp/predictive_plot.png")
-
-    # Add plots to second page
-    pdf.image("./tmp/current_plot.png", 5,140, WIDTH-10)
-    pdf.image("./tmp/predictive_plot.png", 5, 10, WIDTH-10)
-
-    # Save the PDF
-    pdf.output(filename)
-
-    # Clean up temporary files
-    for file in ["stats_table.png", "current_plot.png", "predictive_plot.png", "time_series_plot.png"]:
-        try:
-            os.remove(f"./tmp/{file}")
-        except:
-            pass
-
-    # Try to remove tmp directory if empty
-    try:
-        os.rmdir("./tmp")
-    except:
-        pass
+    HEADER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources',
+                               'report_header.png')
+
+    # Render every plot up front
+    names = ['stats_table', 'time_series_plot', 'current_plot', 'predictive_plot']
+    images = rasterize_figures([stats_table, time_series_plot, current_plot,
+                                predictive_plot], max_workers)
+
+    # FPDF only reads images from paths, so hand it files in a private
+    # per-job directory; concurrent reports never collide and it is always removed
+    with tempfile.TemporaryDirectory(prefix='fred_export_') as tmp_dir:
+        paths = {}
+        for name, image in zip(names, images):
+            paths[name] = os.path.join(tmp_dir, f"{name}.png")
+            with open(paths[name], 'wb') as f:
+                f.write(image)
+
+        ''' First Page '''
+        pdf.add_page()
+        pdf.image(HEADER_PATH, 0, 0, WIDTH)
+        create_title(pdf, title)
+
+        # Add plots to first page
+        pdf.image(paths['stats_table'], 5, 35, WIDTH)
+        pdf.image(paths['time_series_plot'], 5,140, WIDTH)
+
+        ''' Second Page '''
+        pdf.add_page()
+
+        # Add plots to second page
+        pdf.image(paths['current_plot'], 5,140, WIDTH-10)
+        pdf.image(paths['predictive_plot'], 5, 10, WIDTH-10)
+
+        # Save the PDF
+        pdf.output(filename)
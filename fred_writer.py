@@ -0,0 +1,112 @@
+# File for writing transformed data to disk
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# File extensions and the format they select
+FORMATS = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.xlsx': 'excel',
+}
+
+
+def fred_save(df, path='stats.parquet', format=None, compression='zstd',
+              partition_by=None, summary_freq='QS'):
+    """
+    Write a transformed frame as Parquet (default), Arrow IPC or an Excel summary
+
+    Example:
+    >>> fred_save(df, 'stats.parquet')
+    >>> fred_save(df, 'stats_by_period', format='parquet',
+    ...           partition_by='economic_period')
+    >>> fred_save(df, 'stats.xlsx')  # quarterly summary, not every daily row
+
+    Args:
+        df: Transformed DataFrame with a date index
+        path: Output file, or directory when partitioning
+        format: 'parquet', 'arrow' or 'excel'; inferred from the extension
+        compression: Codec for Parquet/Arrow (zstd, lz4, snappy or None)
+        partition_by: None, 'year' or a column such as 'economic_period';
+            writes one file per value under path
+        summary_freq: Resample rule for the Excel summary
+
+    Returns:
+        Path written
+    """
+    if format is None:
+        format = FORMATS.get(os.path.splitext(path)[1].lower(), 'parquet')
+
+    if format == 'excel':
+        summarize(df, summary_freq).to_excel(path)
+        return path
+
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    if partition_by is None:
+        write_table(table, path, format, compression)
+        return path
+
+    # One file per partition value, laid out hive-style (key=value)
+    keys = df.index.year if partition_by == 'year' else df[partition_by]
+    codes, values = pd.factorize(pd.Series(keys, index=df.index), sort=True)
+    os.makedirs(path, exist_ok=True)
+    extension = '.parquet' if format == 'parquet' else '.arrow'
+    for code, value in enumerate(values):
+        part = table.filter(pa.array(codes == code))
+        if partition_by != 'year':
+            part = part.drop_columns([partition_by])
+        part_dir = os.path.join(path, f"{partition_by}={value}")
+        os.makedirs(part_dir, exist_ok=True)
+        write_table(part, os.path.join(part_dir, f"part-0{extension}"), format,
+                    compression)
+    return path
+
+def write_table(table, path, format, compression):
+    if format == 'parquet':
+        pq.write_table(table, path, compression=compression or 'none')
+    elif format == 'arrow':
+        feather.write_feather(table, path, compression=compression or 'uncompressed')
+    else:
+        raise ValueError(f"Unknown format '{format}'")
+
+def summarize(df, freq='QS'):
+    """
+    Downsample a transformed frame for spreadsheet use
+
+    Numeric columns are averaged per period; label columns such as
+    economic_period and quarter keep their last value.
+    """
+    numeric = df.select_dtypes('number').columns
+    labels = [column for column in df.columns if column not in numeric]
+    agg = {**{column: 'mean' for column in numeric},
+           **{column: 'last' for column in labels}}
+    summary = df.resample(freq).agg(agg)[list(df.columns)]
+    return summary.dropna(how='all')
+
+def fred_read(path):
+    """
+    Read a file or partitioned directory written by fred_save back into a frame
+    """
+    if os.path.isdir(path):
+        if _contains(path, '.parquet'):
+            table = pq.read_table(path)
+        else:
+            table = _read_arrow_dataset(path)
+    elif FORMATS.get(os.path.splitext(path)[1].lower()) == 'arrow':
+        table = feather.read_table(path)
+    else:
+        table = pq.read_table(path)
+    return table.to_pandas().set_index('date').sort_index()
+
+def _contains(path, extension):
+    return any(name.endswith(extension)
+               for _, _, files in os.walk(path) for name in files)
+
+def _read_arrow_dataset(path):
+    import pyarrow.dataset as ds
+    return ds.dataset(path, format='ipc', partitioning='hive').to_table()
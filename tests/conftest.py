@@ -0,0 +1,16 @@
+import pytest
+
+import fred_loader
+from fred_benchmark import stub_fred, synthetic_indicators
+
+
+@pytest.fixture(scope='session')
+def indicators():
+    # Synthetic histories for every INDICATORS series, keyed by FRED id
+    return synthetic_indicators('1976-01-01', '2024-12-31')
+
+@pytest.fixture(scope='session')
+def raw(indicators):
+    # The raw outer-joined frame fred_load() builds from the stub server
+    with stub_fred(indicators):
+        return fred_loader.fred_load(use_cache=False)
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from fred_transformer import fred_transform
+
+START_DATE = '1996-12-31'
+
+
+def test_compact_matches_default_output(raw):
+    full = fred_transform(raw, START_DATE, memo=None)
+    compact = fred_transform(raw, START_DATE, compact=True, memo=None)
+
+    assert list(compact.columns) == [
+        'quarter_code' if column == 'quarter' else column for column in full.columns
+    ]
+    pd.testing.assert_frame_equal(
+        compact.drop(columns='quarter_code'),
+        full.drop(columns='quarter'),
+        check_dtype=False,
+        check_categorical=False,
+        rtol=1e-6,
+    )
+
+def test_compact_narrows_floats_and_labels(raw):
+    compact = fred_transform(raw, START_DATE, compact=True, memo=None)
+
+    assert (compact.dtypes == 'float32').any()
+    assert isinstance(compact['economic_period'].dtype, pd.CategoricalDtype)
+    assert compact.memory_usage(deep=True).sum() < \
+        fred_transform(raw, START_DATE, memo=None).memory_usage(deep=True).sum()
+
+def test_quarter_code_round_trips_to_quarter_labels(raw):
+    full = fred_transform(raw, START_DATE, memo=None)
+    compact = fred_transform(raw, START_DATE, compact=True, memo=None)
+
+    quarters = pd.PeriodIndex.from_ordinals(compact['quarter_code'], freq='Q')
+    labels = quarters.quarter.astype(str) + 'Q' + quarters.year.astype(str).str[-2:]
+    assert list(labels) == list(full['quarter'])
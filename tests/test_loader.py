@@ -0,0 +1,25 @@
+import pandas as pd
+
+import fred_loader
+from fred_benchmark import stub_fred
+from fred_config import INDICATORS, MAX_WORKERS
+
+
+def test_concurrent_load_matches_sequential_build(indicators):
+    with stub_fred(indicators, latency=0.01) as server:
+        concurrent = fred_loader.fred_load(use_cache=False)
+        connections = len(server.connections)
+
+        # One request at a time, without the shared session
+        sequential = pd.DataFrame({name: fred_loader.get_fred_data(info['id'])
+                                   for name, info in INDICATORS.items()})
+
+    pd.testing.assert_frame_equal(concurrent, sequential)
+    assert 0 < connections <= MAX_WORKERS
+
+def test_every_series_requested_once(indicators):
+    with stub_fred(indicators) as server:
+        fred_loader.fred_load(use_cache=False)
+
+    requested = sorted(query['series_id'] for query in server.requests)
+    assert requested == sorted(info['id'] for info in INDICATORS.values())